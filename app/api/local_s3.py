@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Request, Response
+
+from app.services.local_aws import local_s3
+
+router = APIRouter()
+
+@router.put("/local-s3/{bucket}/{key:path}", include_in_schema=False)
+async def put_object(bucket: str, key: str, request: Request):
+    """Target of the presigned upload URLs handed out with AWS_BACKEND=local."""
+    local_s3.put_object(Bucket=bucket, Key=key, Body=await request.body())
+    return Response(status_code=200)
@@ -8,7 +8,6 @@ from app.db.session import get_db
 from app.core.config import settings
 from app.core.security import create_access_token, verify_password, get_current_user
 from app.crud.user import get_user_by_email
-from app.models.user import User
 from app.schemas.user import User as UserSchema
 from app.schemas.user import Token
 from app.utils.logger import logger
@@ -44,7 +43,7 @@ def login(
 
 @router.get("/me", response_model=UserSchema)
 def read_users_me(
-    current_user: User = Depends(get_current_user),
+    current_user: UserSchema = Depends(get_current_user),
 ) -> Any:
     """
     Get current user.
@@ -0,0 +1,61 @@
+from functools import partial
+from typing import List
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from app.db.session import get_read_db
+from app.db.writer import db_writer
+from app.crud import ingest as crud_ingest
+from app.schemas.ingest import IngestBatch
+from app.services.processing import BatchReplaceError, refresh_snapshot, replace_batch as replace_archive
+from app.core.security import get_current_active_superuser
+from app.utils.logger import logger
+
+router = APIRouter()
+
+@router.get("/batches", response_model=List[IngestBatch])
+def list_batches(db: Session = Depends(get_read_db), current_user: str = Depends(get_current_active_superuser)):
+    """
+    List ingest batches, one per processed archive.
+    """
+    return crud_ingest.get_batches(db)
+
+@router.delete("/batches/{batch_id}", response_model=IngestBatch)
+async def purge_batch(batch_id: int, rebuild: bool = False, current_user: str = Depends(get_current_active_superuser)):
+    """
+    Delete every character and pattern produced by a batch.
+    Use rebuild=true when the batch makes up most of the data.
+    """
+    logger.info(f"Purging batch {batch_id} (rebuild={rebuild})")
+    batch = await run_in_threadpool(db_writer.write, partial(crud_ingest.purge_batch, batch_id=batch_id, rebuild=rebuild))
+    if not batch:
+        raise HTTPException(status_code=404, detail=f"Batch {batch_id} not found")
+    await run_in_threadpool(refresh_snapshot)
+    return batch
+
+@router.put("/batches/{batch_id}")
+async def replace_batch(batch_id: int, file: UploadFile = File(...), current_user: str = Depends(get_current_active_superuser)):
+    """
+    Replace a batch with the contents of a new archive. The old batch is only
+    purged once the new archive is ingested; on failure it is kept.
+    """
+    if not file.filename.endswith('.zip'):
+        logger.warning(f"Invalid file type: {file.filename}")
+        raise HTTPException(status_code=400, detail="Only ZIP files are accepted")
+
+    contents = await file.read()
+    try:
+        new_batch_id = await run_in_threadpool(replace_archive, batch_id, contents, source=file.filename)
+    except BatchReplaceError as e:
+        raise HTTPException(status_code=409, detail=f"Batch {batch_id} was not replaced: {e}")
+    except Exception:
+        logger.exception(f"Error ingesting replacement for batch {batch_id}")
+        raise HTTPException(
+            status_code=500, detail=f"An unexpected error occurred while processing the file; batch {batch_id} was kept"
+        )
+    if new_batch_id is None:
+        raise HTTPException(status_code=404, detail=f"Batch {batch_id} not found")
+
+    logger.info(f"Replaced batch {batch_id} with batch {new_batch_id}")
+    return {"message": "Batch replaced successfully", "replaced_batch_id": batch_id, "batch_id": new_batch_id}
@@ -1,16 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException
+import hashlib
+import re
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 
-from app.db.session import get_db
+from app.core.config import settings
+from app.db.session import get_read_db
 from app.crud import character as crud
-from app.schemas.character import StatsResponse, AffiliationStatsResponse, CharacterStatsResponse
+from app.schemas.character import (
+    StatsResponse, AffiliationStatsResponse, AllAffiliationStatsResponse, CharacterStatsResponse, GCProfileResponse,
+    CharacterSpectrumResponse, AffiliationSpectrumResponse, KmerEnrichmentResponse
+)
 from app.core.security import get_current_user
 from app.services.visualization import visualization_service
 
 router = APIRouter()
 
+def _snapshot():
+    """The columnar snapshot, when stats are configured to be served from one and it exists."""
+    if not settings.STATS_FROM_SNAPSHOT:
+        return None
+    from app.services.snapshot import snapshot_service
+    return snapshot_service.current()
+
+def _snapshot_stats(snapshot, affiliation: str = None, top_patterns: int = settings.TOP_PATTERNS_COUNT) -> dict:
+    stats = snapshot.stats(affiliation, top_patterns)
+    stats["visualizations"] = visualization_service.get_column_visualizations(*snapshot.chart_columns(affiliation))
+    return stats
+
 @router.get("/stats", response_model=StatsResponse)
-def get_stats(db: Session = Depends(get_db), current_user: str = Depends(get_current_user)):
+def get_stats(db: Session = Depends(get_read_db), current_user: str = Depends(get_current_user)):
+    snapshot = _snapshot()
+    if snapshot is not None:
+        return _snapshot_stats(snapshot)
+
     # Get all characters for visualization
     characters = crud.get_characters(db)
     
@@ -26,16 +50,159 @@ def get_stats(db: Session = Depends(get_db), current_user: str = Depends(get_cur
     return stats
 
 @router.get("/affiliation/{affiliation}", response_model=AffiliationStatsResponse)
-def get_affiliation_stats(affiliation: str, db: Session = Depends(get_db), current_user: str = Depends(get_current_user)):
+def get_affiliation_stats(affiliation: str, db: Session = Depends(get_read_db), current_user: str = Depends(get_current_user)):
+    snapshot = _snapshot()
+    if snapshot is not None:
+        return _snapshot_stats(snapshot, affiliation, 10)
     characters = crud.get_characters_by_affiliation(db, affiliation)
     visualizations = visualization_service.get_visualizations(characters)
     stats = crud.get_affiliation_stats(db, affiliation)
     stats["visualizations"] = visualizations
     return stats
 
+@router.get("/affiliations/stats", response_model=AllAffiliationStatsResponse)
+def get_all_affiliation_stats(
+    render: bool = False,
+    top: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+    current_user: str = Depends(get_current_user)
+):
+    """Stats for every affiliation at once; charts are only rendered with ?render=true."""
+    affiliations = crud.get_all_affiliation_stats(db, top)
+    for affiliation, stats in affiliations.items():
+        characters = stats.pop("characters")
+        if render:
+            # The hash keeps affiliations that slug alike, e.g. "Red Team" and "red-team", apart
+            slug = re.sub(r"[^A-Za-z0-9]+", "_", affiliation).strip("_").lower()
+            prefix = f"{slug}_{hashlib.sha1(affiliation.encode()).hexdigest()[:8]}_"
+            stats["visualizations"] = visualization_service.get_visualizations(characters, prefix)
+    return {"affiliations": affiliations}
+
 @router.get("/character/{name}", response_model=CharacterStatsResponse)
-def get_character_stats(name: str, db: Session = Depends(get_db), current_user: str = Depends(get_current_user)):
-    character = crud.get_character_stats(db, name) 
+def get_character_stats(
+    name: str,
+    limit: Optional[int] = Query(None, ge=1),
+    min_count: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_read_db),
+    current_user: str = Depends(get_current_user)
+):
+    """
+    The character and its patterns, most frequent first, optionally only the
+    first limit patterns occurring at least min_count times.
+
+    With CHARACTER_STATS_ORJSON the body is built from row tuples and
+    encoded with orjson, skipping an ORM object and a validated model per pattern.
+    """
+    if settings.CHARACTER_STATS_ORJSON:
+        character = crud.get_character_row(db, name)
+        if not character:
+            raise HTTPException(status_code=404, detail=f"Character {name} not found")
+        patterns = crud.get_character_pattern_rows(db, character.id, limit, min_count)
+        return ORJSONResponse({
+            "character_name": character.character_name,
+            "affiliation": character.affiliation,
+            "genetic_sequence": character.genetic_sequence,
+            "power_level": character.power_level,
+            "gc_content": character.gc_content,
+            "power_level_group": character.power_level_group,
+            "patterns": [{"pattern": pattern, "count": count} for pattern, count in patterns],
+            "id": character.id
+        })
+
+    character = crud.get_character_stats(db, name)
     if not character:
         raise HTTPException(status_code=404, detail=f"Character {name} not found")
-    return character
\ No newline at end of file
+    patterns = sorted(character.patterns, key=lambda pattern: (-pattern.count, pattern.pattern_id))
+    if min_count is not None:
+        patterns = [pattern for pattern in patterns if pattern.count >= min_count]
+    return {
+        "character_name": character.character_name,
+        "affiliation": character.affiliation,
+        "genetic_sequence": character.genetic_sequence,
+        "power_level": character.power_level,
+        "gc_content": character.gc_content,
+        "power_level_group": character.power_level_group,
+        "patterns": patterns[:limit],
+        "id": character.id
+    }
+
+@router.get("/character/{name}/gc-profile", response_model=GCProfileResponse)
+def get_character_gc_profile(
+    name: str,
+    window: int = Query(100, ge=1),
+    step: int = Query(10, ge=1),
+    db: Session = Depends(get_read_db),
+    current_user: str = Depends(get_current_user)
+):
+    """GC content and GC skew along the character's sequence, at most GC_PROFILE_MAX_POINTS windows."""
+    from app.services.gc_profile import cached_gc_profile
+
+    character = crud.get_character_version(db, name)
+    if not character:
+        raise HTTPException(status_code=404, detail=f"Character {name} not found")
+    profile = cached_gc_profile(
+        (character.id, character.sequence_hash), lambda: crud.get_character_sequence(db, character.id) or "", window, step
+    )
+    if profile["length"] < window:
+        raise HTTPException(status_code=400, detail=f"Window {window} is longer than the sequence ({profile['length']} bases)")
+    return {"character_name": name, "window": window, **profile}
+
+@router.get("/character/{name}/spectrum", response_model=CharacterSpectrumResponse)
+def get_character_spectrum(name: str, db: Session = Depends(get_read_db), current_user: str = Depends(get_current_user)):
+    """Non-zero k-mer counts of the character's sequence, as computed at ingest."""
+    from app.crud import spectrum as crud_spectrum
+    from app.utils.spectrum import decode_spectrum, spectrum_counts
+
+    character = crud.get_character_version(db, name)
+    spectrum = crud_spectrum.get_character_spectrum(db, character.id) if character else None
+    if not spectrum:
+        raise HTTPException(status_code=404, detail=f"No k-mer spectrum for character {name}")
+    counts = decode_spectrum(spectrum.counts, spectrum.k)
+    return {"character_name": name, "k": spectrum.k, "total": int(counts.sum()), "counts": spectrum_counts(counts, spectrum.k)}
+
+def _affiliation_spectrum(db: Session, affiliation: str, k: int):
+    from app.crud import spectrum as crud_spectrum
+
+    spectrum = crud_spectrum.get_affiliation_spectrum(db, affiliation, k)
+    if not spectrum:
+        raise HTTPException(status_code=404, detail=f"No k={k} spectrum for affiliation {affiliation}")
+    return spectrum
+
+@router.get("/affiliation/{affiliation}/spectrum", response_model=AffiliationSpectrumResponse)
+def get_affiliation_spectrum(
+    affiliation: str,
+    k: Optional[int] = Query(None, ge=1, le=8),
+    db: Session = Depends(get_read_db),
+    current_user: str = Depends(get_current_user)
+):
+    """Summed k-mer counts over the affiliation's characters (k defaults to KMER_SPECTRUM_K)."""
+    from app.utils.spectrum import decode_totals, spectrum_counts
+
+    k = k or settings.KMER_SPECTRUM_K
+    spectrum = _affiliation_spectrum(db, affiliation, k)
+    counts = decode_totals(spectrum.counts)
+    return {
+        "affiliation": affiliation,
+        "k": k,
+        "character_count": spectrum.character_count,
+        "total": int(counts.sum()),
+        "counts": spectrum_counts(counts, k)
+    }
+
+@router.get("/affiliations/enrichment", response_model=KmerEnrichmentResponse)
+def get_kmer_enrichment(
+    a: str,
+    b: str,
+    k: Optional[int] = Query(None, ge=1, le=8),
+    top: int = Query(20, ge=1, le=1000),
+    db: Session = Depends(get_read_db),
+    current_user: str = Depends(get_current_user)
+):
+    """k-mers most over-represented in affiliation a relative to b, and vice versa, by log2 fold change."""
+    from app.utils.spectrum import decode_totals, enrichment
+
+    k = k or settings.KMER_SPECTRUM_K
+    counts_a = decode_totals(_affiliation_spectrum(db, a, k).counts)
+    counts_b = decode_totals(_affiliation_spectrum(db, b, k).counts)
+    enriched_in_a, enriched_in_b = enrichment(counts_a, counts_b, k, top)
+    return {"affiliation_a": a, "affiliation_b": b, "k": k, "enriched_in_a": enriched_in_a, "enriched_in_b": enriched_in_b}
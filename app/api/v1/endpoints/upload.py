@@ -1,10 +1,11 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+import hashlib
 import uuid
 from datetime import datetime
+from typing import Optional
 
-from app.db.session import get_db
-from app.services.processing import process_zip_file
+from app.services.processing import load_checkpoint, process_zip_file
 from app.services.s3_service import s3_service
 from app.utils.logger import logger
 from app.core.security import get_current_user
@@ -43,7 +44,11 @@ async def generate_upload_url(current_user: str = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail="An unexpected error occurred")
 
 @router.post("/upload")
-async def upload_genetic_data(file: UploadFile = File(...), db: Session = Depends(get_db), current_user: str = Depends(get_current_user)):
+async def upload_genetic_data(
+    file: UploadFile = File(...),
+    upsert: Optional[bool] = None,
+    current_user: str = Depends(get_current_user)
+):
     logger.info(f"Processing upload request for file: {file.filename}")
     
     if not file.filename.endswith('.zip'):
@@ -55,11 +60,17 @@ async def upload_genetic_data(file: UploadFile = File(...), db: Session = Depend
         contents = await file.read()
         logger.debug(f"Read {len(contents)} bytes from file")
         
-        # Process the ZIP file
-        process_zip_file(contents, db)
+        # An archive already ingested in full is not processed again
+        batch_id, _, completed = await run_in_threadpool(load_checkpoint, hashlib.sha256(contents).hexdigest())
+        if completed:
+            logger.info(f"Upload {file.filename} was already ingested as batch {batch_id}, skipped")
+            return {"message": "Archive was already ingested, nothing was processed", "batch_id": batch_id, "skipped": True}
+
+        # Process the ZIP file off the event loop
+        batch_id = await run_in_threadpool(process_zip_file, contents, source=file.filename, upsert=upsert)
         
-        logger.info("Successfully processed upload")
-        return {"message": "Data processed successfully"}
+        logger.info(f"Successfully processed upload as batch {batch_id}")
+        return {"message": "Data processed successfully", "batch_id": batch_id, "skipped": False}
     except Exception as e:
         logger.exception("Error processing upload")
         raise HTTPException(status_code=500, detail="An unexpected error occurred while processing the file") 
\ No newline at end of file
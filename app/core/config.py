@@ -7,12 +7,25 @@ class Settings(BaseSettings):
     
     SQLALCHEMY_DATABASE_URL: str = "sqlite:///./marvel_genetics.db"
 
+    # SQLite Settings
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # Safe with WAL, avoids an fsync per commit
+
+    # Write Coordination Settings
+    DB_WRITE_QUEUE_SIZE: int = 64  # Pending batches before producers block
+    DB_GROUP_COMMIT_MAX_BATCHES: int = 16  # Batches committed in one transaction
+    DB_GROUP_COMMIT_WAIT_MS: int = 5  # How long to wait for more batches to join a commit
+    INGEST_BATCH_SIZE: int = 200  # Characters per committed chunk (and checkpoint) of an archive
+    INGEST_UPSERT: bool = False  # Update characters matched on name and affiliation instead of inserting duplicates
+
     # AWS settings
     AWS_ACCESS_KEY_ID: str
     AWS_SECRET_ACCESS_KEY: str
     AWS_REGION: str = "us-east-1"
     AWS_S3_BUCKET: str
     AWS_SQS_QUEUE_URL: str
+    AWS_BACKEND: str = "aws"  # "local" swaps S3 and SQS for in-process fakes (load tests, development)
+    LOCAL_S3_ENDPOINT: str = "http://localhost:8000/local-s3"  # Where presigned URLs point with AWS_BACKEND=local
 
     # S3 Upload Settings
     S3_UPLOAD_EXPIRATION: int = 3600  # URL expiration time in seconds
@@ -25,14 +38,63 @@ class Settings(BaseSettings):
     POWER_LEVEL_LOW_THRESHOLD: int = 33
     POWER_LEVEL_MEDIUM_THRESHOLD: int = 66
     
+    # K-mer Spectrum Settings
+    KMER_SPECTRUM_K: int = 4  # k-mer length of the spectrum stored per character at ingest (1-8); 0 disables
+
+    # GC Profile Settings
+    GC_PROFILE_MAX_POINTS: int = 1000  # Windows returned per profile; the step is widened beyond this
+    GC_PROFILE_CACHE_SIZE: int = 256  # Computed profiles kept in memory
+    GC_PROFILE_CACHE_TTL_SECONDS: int = 600
+
+    # Character Response Settings
+    CHARACTER_STATS_ORJSON: bool = True  # Serialize /character/{name} from row tuples with orjson instead of through the response model
+
+    # Snapshot Settings
+    SNAPSHOT_ENABLED: bool = False  # Refresh the columnar snapshot after ingests and purges
+    SNAPSHOT_DIR: str = "snapshot"
+    STATS_FROM_SNAPSHOT: bool = False  # Serve /stats and /affiliation/{affiliation} from the snapshot when one exists
+
+    # Worker Settings
+    SQS_CONSUMER_ENABLED: bool = True  # Run an SQS consumer thread in the API process; disable when app.worker consumes the queue
+    SQS_WAIT_TIME_SECONDS: int = 20  # SQS long-poll duration, also the longest an idle consumer takes to stop
+    SQS_PREFETCH_ARCHIVES: int = 2  # Archives received and downloaded ahead of processing; 0 disables prefetch
+    SQS_PREFETCH_BYTES: int = 256 * 1024 * 1024  # Memory budget for prefetched archives
+    WORKER_HEALTH_INTERVAL: int = 30  # Seconds between app.worker health reports
+    WORKER_HEALTH_FILE: str = ""  # JSON health report rewritten every interval; empty disables
+    WORKER_STALL_TIMEOUT_SECONDS: int = 1800  # Restart a consumer without a heartbeat for this long; 0 disables
+    WORKER_DRAIN_TIMEOUT_SECONDS: int = 300  # Consumers still busy this long after a stop signal are terminated
+    WORKER_METRICS_PORT: int = 9100  # app.worker serves /metrics, summed over its processes, on this port; 0 disables
+
+    # Metrics Settings
+    METRICS_ENABLED: bool = True  # Serve Prometheus metrics on /metrics
+    SQS_QUEUE_DEPTH_INTERVAL: int = 30  # Seconds between SQS backlog checks
+
+    # Profiling Settings (opt-in)
+    PROFILING_ENABLED: bool = False  # Install the request profiling middleware
+    PROFILING_SAMPLE_RATE: float = 0.0  # Share of requests profiled at random
+    PROFILING_HEADER: str = "X-Profile"  # Superusers can send this header to profile a request
+    PROFILING_INTERVAL_MS: int = 5  # Stack sampling interval
+    PROFILING_DIR: str = "profiles"
+    PROFILING_MAX_FILES: int = 100  # Oldest profiles are deleted beyond this
+    SLOW_QUERY_THRESHOLD_MS: int = 0  # Log SQL statements slower than this; 0 disables
+
+    # Startup Settings
+    STARTUP_IMPORT_BUDGET_MS: int = 1500  # scripts/benchmark_startup.py fails when importing app.main takes longer
+
     # Logging Settings
     LOG_LEVEL: str = "INFO"
     LOG_FORMAT: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    LOG_JSON: bool = False  # Write one JSON object per log line
+    LOG_QUEUE_SIZE: int = 10000  # Records waiting for the log writer thread; extra records are dropped
+    LOG_RATE_LIMIT_BURST: int = 10  # Per-record errors logged per call site per window
+    LOG_RATE_LIMIT_WINDOW_SECONDS: float = 60
 
     # JWT Settings
     SECRET_KEY: str  # Used to sign JWT tokens
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    USER_CACHE_SIZE: int = 1024  # Verified tokens cached by get_current_user
+    USER_CACHE_TTL_SECONDS: int = 30  # Longest a user change made by another process or by raw SQL goes unseen
     
     class Config:
         case_sensitive = True
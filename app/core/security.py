@@ -1,21 +1,29 @@
+import time
 from datetime import datetime, timedelta
-from typing import Any, Union
+from typing import Any, Optional, Union
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from pydantic import ValidationError
-from sqlalchemy.orm import Session
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
 from passlib.context import CryptContext
 
-from app.db.session import get_db
+from app.db.session import SessionLocal
 from app.core.config import settings
 from app.crud.user import get_user_by_id
 from app.models.user import User
 from app.schemas.user import TokenPayload
+from app.schemas.user import User as UserSchema
+from app.utils.cache import TTLCache
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
+# Verified token -> user snapshot. The cache is per process: other API replicas and
+# workers only see a user change once USER_CACHE_TTL_SECONDS expires.
+_user_cache = TTLCache(max_size=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS)
+
 def create_access_token(subject: Union[str, Any], expires_delta: timedelta | None = None) -> str:
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -32,10 +40,25 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
-def get_current_user(
-    db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme)
-) -> User:
+def _cache_ttl(payload: dict) -> float:
+    # Never serve a token from the cache past its own expiry
+    expires_in = payload.get("exp", 0) - time.time()
+    return min(settings.USER_CACHE_TTL_SECONDS, expires_in)
+
+def get_user_for_token(token: str) -> Optional[UserSchema]:
+    """
+    Resolve a bearer token to a snapshot of its user.
+
+    Verified tokens are cached for USER_CACHE_TTL_SECONDS, so repeated
+    requests with the same token skip both jwt.decode and the user query.
+
+    Raises:
+        HTTPException: If the token is invalid
+    """
+    user = _user_cache.get(token)
+    if user is not None:
+        return user
+
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
@@ -46,8 +69,79 @@ def get_current_user(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    
-    user = get_user_by_id(db, token_data.sub)
+
+    with SessionLocal() as db:
+        db_user = get_user_by_id(db, token_data.sub)
+        if not db_user:
+            return None
+        user = UserSchema.model_validate(db_user)
+
+    ttl = _cache_ttl(payload)
+    if ttl > 0:
+        _user_cache.set(token, user, ttl)
+    return user
+
+def get_current_user(token: str = Depends(oauth2_scheme)) -> UserSchema:
+    user = get_user_for_token(token)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
\ No newline at end of file
+    return user
+
+def is_superuser_token(token: str) -> bool:
+    """Check whether a bearer token belongs to an active superuser, without raising."""
+    try:
+        user = get_user_for_token(token)
+    except HTTPException:
+        return False
+    return bool(user and user.is_active and user.is_superuser)
+
+def get_current_active_superuser(current_user: UserSchema = Depends(get_current_user)) -> UserSchema:
+    if not current_user.is_active or not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="The user doesn't have enough privileges",
+        )
+    return current_user
+
+def invalidate_cached_user(user_id: int) -> None:
+    """Drop every cached token of a user, e.g. after it is deactivated or changed."""
+    _user_cache.discard_where(lambda token, user: user.id == user_id)
+
+# Invalidation happens when the change commits: dropping the entry at flush
+# would let a concurrent request re-cache the old row before the commit.
+# Changes made by another process, or by raw SQL, only show up once
+# USER_CACHE_TTL_SECONDS expires.
+_CHANGED_USERS = "changed_user_ids"
+_ALL_USERS = "all"
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _record_changed_user(mapper, connection, target: User) -> None:
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_CHANGED_USERS, set()).add(target.id)
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_bulk_user_changes(orm_execute_state) -> None:
+    # Bulk update()/delete() statements name no rows: drop every cached user
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ is User:
+            orm_execute_state.session.info.setdefault(_CHANGED_USERS, set()).add(_ALL_USERS)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session: Session) -> None:
+    changed = session.info.pop(_CHANGED_USERS, None)
+    if not changed:
+        return
+    if _ALL_USERS in changed:
+        _user_cache.clear()
+        return
+    for user_id in changed:
+        invalidate_cached_user(user_id)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back_users(session: Session, previous_transaction) -> None:
+    # A savepoint rollback keeps the outer transaction's changes
+    if previous_transaction.parent is None:
+        session.info.pop(_CHANGED_USERS, None)
@@ -1,31 +1,173 @@
+from typing import Any, Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import bindparam, case, func, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
-from app.models.character import Character, Pattern
+from app.models.character import Character, PatternDictionary, CharacterPattern
 from app.schemas.character import CharacterCreate
 from app.core.config import settings
+from app.utils.kmer import encode_kmer
 
-def create_character(db: Session, character_data: dict):
+# Stay well below SQLite's bound-parameter limit for IN (...) lookups
+PATTERN_LOOKUP_CHUNK_SIZE = 500
+
+def create_character(db: Session, character_data: dict, batch_id: Optional[int] = None):
     character = Character(
         character_name=character_data['character_name'],
         affiliation=character_data['affiliation'],
         genetic_sequence=character_data['genetic_sequence'],
+        sequence_hash=character_data.get('sequence_hash'),
         power_level=character_data['power_level'],
         gc_content=character_data.get('gc_content', 0),
-        power_level_group=character_data.get('power_level_group', 'low')
+        power_level_group=character_data.get('power_level_group', 'low'),
+        batch_id=batch_id
     )
     db.add(character)
     db.flush()
     return character
 
-def create_pattern(db: Session, character_id: int, pattern: str, count: int):
-    pattern_record = Pattern(
-        character_id=character_id,
-        pattern=pattern,
-        count=count
+def create_characters(db: Session, characters_data: List[dict], batch_id: Optional[int] = None) -> List[int]:
+    """Bulk insert characters in one statement, returning their ids in input order."""
+    if not characters_data:
+        return []
+    rows = db.execute(
+        insert(Character).returning(Character.id, sort_by_parameter_order=True),
+        [
+            {
+                'character_name': character_data['character_name'],
+                'affiliation': character_data['affiliation'],
+                'genetic_sequence': character_data['genetic_sequence'],
+                'sequence_hash': character_data.get('sequence_hash'),
+                'power_level': character_data['power_level'],
+                'gc_content': character_data.get('gc_content', 0),
+                'power_level_group': character_data.get('power_level_group', 'low'),
+                'batch_id': batch_id
+            }
+            for character_data in characters_data
+        ]
+    )
+    return [row.id for row in rows]
+
+def get_characters_by_key(db: Session, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Any]:
+    """
+    Look up the stored character for each (character_name, affiliation) key.
+
+    Returns:
+        Dict: Key to a row with id, sequence_hash and power_level, for the most
+            recently inserted match. Rows stored before sequence hashes were
+            recorded have a NULL sequence_hash and carry genetic_sequence instead.
+    """
+    characters = {}
+    names = sorted({name for name, _ in keys})
+    wanted = set(keys)
+    for i in range(0, len(names), PATTERN_LOOKUP_CHUNK_SIZE):
+        rows = db.query(
+            Character.id, Character.character_name, Character.affiliation, Character.sequence_hash,
+            Character.power_level,
+            case((Character.sequence_hash.is_(None), Character.genetic_sequence)).label('genetic_sequence')
+        ).filter(Character.character_name.in_(names[i:i + PATTERN_LOOKUP_CHUNK_SIZE])).order_by(Character.id)
+        for row in rows:
+            key = (row.character_name, row.affiliation)
+            if key in wanted:
+                characters[key] = row
+    return characters
+
+def update_characters(db: Session, updates: List[dict]) -> None:
+    """Bulk update characters by id; every dict holds 'id' and the same set of columns."""
+    if updates:
+        db.execute(update(Character), updates)
+
+def delete_patterns_for_characters(db: Session, character_ids: List[int]) -> None:
+    """Delete characters' pattern rows and remove their counts from the dictionary's running totals."""
+    subtract = update(PatternDictionary.__table__)\
+        .where(PatternDictionary.__table__.c.id == bindparam('pattern_id'))\
+        .values(total_count=PatternDictionary.__table__.c.total_count - bindparam('count'))
+    for i in range(0, len(character_ids), PATTERN_LOOKUP_CHUNK_SIZE):
+        chunk = character_ids[i:i + PATTERN_LOOKUP_CHUNK_SIZE]
+        totals = db.query(CharacterPattern.pattern_id, func.sum(CharacterPattern.count))\
+            .filter(CharacterPattern.character_id.in_(chunk))\
+            .group_by(CharacterPattern.pattern_id)\
+            .all()
+        if totals:
+            db.execute(subtract, [{'pattern_id': pattern_id, 'count': count} for pattern_id, count in totals])
+        db.query(CharacterPattern).filter(CharacterPattern.character_id.in_(chunk)).delete(synchronize_session=False)
+
+def retag_patterns(db: Session, character_ids: List[int], batch_id: Optional[int]) -> None:
+    """Move characters' pattern rows to another ingest batch."""
+    for i in range(0, len(character_ids), PATTERN_LOOKUP_CHUNK_SIZE):
+        db.query(CharacterPattern)\
+            .filter(CharacterPattern.character_id.in_(character_ids[i:i + PATTERN_LOOKUP_CHUNK_SIZE]))\
+            .update({'batch_id': batch_id}, synchronize_session=False)
+
+def _lookup_pattern_ids(db: Session, patterns: List[str]) -> Dict[str, int]:
+    ids = {}
+    for i in range(0, len(patterns), PATTERN_LOOKUP_CHUNK_SIZE):
+        chunk = patterns[i:i + PATTERN_LOOKUP_CHUNK_SIZE]
+        ids.update(db.query(PatternDictionary.pattern, PatternDictionary.id).filter(PatternDictionary.pattern.in_(chunk)).all())
+    return ids
+
+def add_pattern_counts(db: Session, patterns: List[Tuple[str, int]]) -> Dict[str, int]:
+    """
+    Add (pattern, count) pairs to the dictionary's running totals, creating
+    motifs that are not stored yet, and map each motif to its dictionary id.
+    """
+    statement = sqlite_insert(PatternDictionary)
+    statement = statement.on_conflict_do_update(
+        index_elements=['pattern'],
+        set_={'total_count': PatternDictionary.total_count + statement.excluded.total_count}
     )
-    db.add(pattern_record)
-    return pattern_record
+    db.execute(statement, [
+        {'pattern': p, 'length': len(p), 'code': encode_kmer(p), 'total_count': count}
+        for p, count in patterns
+    ])
+    return _lookup_pattern_ids(db, [p for p, _ in patterns])
+
+def create_patterns(db: Session, character_id: int, patterns: List[Tuple[str, int]], batch_id: Optional[int] = None) -> None:
+    """Bulk insert the (pattern, count) pairs found in a character's sequence."""
+    if not patterns:
+        return
+    pattern_ids = add_pattern_counts(db, patterns)
+    db.execute(insert(CharacterPattern), [
+        {'pattern_id': pattern_ids[pattern], 'character_id': character_id, 'count': count, 'batch_id': batch_id}
+        for pattern, count in patterns
+    ])
+
+def create_patterns_for_characters(
+    db: Session,
+    character_patterns: List[Tuple[int, List[Tuple[str, int]]]],
+    batch_id: Optional[int] = None
+) -> None:
+    """
+    Bulk insert patterns for several characters, updating each motif's
+    running total once for the whole set instead of once per character.
+    """
+    totals: Dict[str, int] = {}
+    for _, patterns in character_patterns:
+        for pattern, count in patterns:
+            totals[pattern] = totals.get(pattern, 0) + count
+    if not totals:
+        return
+    pattern_ids = add_pattern_counts(db, list(totals.items()))
+    db.execute(insert(CharacterPattern), [
+        {'pattern_id': pattern_ids[pattern], 'character_id': character_id, 'count': count, 'batch_id': batch_id}
+        for character_id, patterns in character_patterns
+        for pattern, count in patterns
+    ])
+
+def create_pattern(db: Session, character_id: int, pattern: str, count: int, batch_id: Optional[int] = None):
+    create_patterns(db, character_id, [(pattern, count)], batch_id)
+
+def _top_patterns(counts_query, db: Session, limit: int):
+    # Rank on integer pattern ids and only resolve the winning motifs' strings
+    top = counts_query\
+        .group_by(CharacterPattern.pattern_id)\
+        .order_by(func.sum(CharacterPattern.count).desc())\
+        .limit(limit)\
+        .subquery()
+    return db.query(PatternDictionary.pattern, top.c.total_count)\
+        .join(top, PatternDictionary.id == top.c.pattern_id)\
+        .order_by(top.c.total_count.desc())\
+        .all()
 
 def get_characters_stats(db: Session):
     # Get GC content by character
@@ -35,9 +177,9 @@ def get_characters_stats(db: Session):
     }
 
     # Get common patterns
-    patterns = db.query(Pattern.pattern, func.sum(Pattern.count).label('total_count'))\
-        .group_by(Pattern.pattern)\
-        .order_by(func.sum(Pattern.count).desc())\
+    patterns = db.query(PatternDictionary.pattern, PatternDictionary.total_count)\
+        .filter(PatternDictionary.total_count > 0)\
+        .order_by(PatternDictionary.total_count.desc())\
         .limit(settings.TOP_PATTERNS_COUNT)\
         .all()
     common_patterns = [{p[0]: p[1]} for p in patterns]
@@ -59,6 +201,45 @@ def get_character_stats(db: Session, name: str):
     character = db.query(Character).filter(Character.character_name == name).first()
     return character
 
+def get_character_row(db: Session, name: str):
+    """The columns of the character get_character_stats returns, as a row rather than an ORM object."""
+    return db.execute(
+        select(
+            Character.id, Character.character_name, Character.affiliation, Character.genetic_sequence,
+            Character.power_level, Character.gc_content, Character.power_level_group
+        ).where(Character.character_name == name).limit(1)
+    ).first()
+
+def get_character_pattern_rows(
+    db: Session, character_id: int, limit: Optional[int] = None, min_count: Optional[int] = None
+) -> List[Tuple[str, int]]:
+    """
+    A character's (pattern, count) rows, most frequent first.
+
+    Args:
+        db: SQLAlchemy database session
+        character_id: The character
+        limit: Return at most this many patterns
+        min_count: Skip patterns occurring fewer times than this
+    """
+    query = select(PatternDictionary.pattern, CharacterPattern.count)\
+        .join(PatternDictionary, PatternDictionary.id == CharacterPattern.pattern_id)\
+        .where(CharacterPattern.character_id == character_id)
+    if min_count is not None:
+        query = query.where(CharacterPattern.count >= min_count)
+    query = query.order_by(CharacterPattern.count.desc(), CharacterPattern.pattern_id)
+    if limit is not None:
+        query = query.limit(limit)
+    # Core execution: the ORM layer adds nothing to plain column rows but per-row overhead
+    return db.connection().execute(query).all()
+
+def get_character_version(db: Session, name: str):
+    """Id and sequence hash of the character get_character_stats returns, without loading its sequence."""
+    return db.query(Character.id, Character.sequence_hash).filter(Character.character_name == name).first()
+
+def get_character_sequence(db: Session, character_id: int) -> Optional[str]:
+    return db.query(Character.genetic_sequence).filter(Character.id == character_id).scalar()
+
 def get_characters(db: Session):
     characters = db.query(Character).all()
     return characters
@@ -67,6 +248,72 @@ def get_characters_by_affiliation(db: Session, affiliation: str):
     characters = db.query(Character).filter(Character.affiliation == affiliation).all()
     return characters
 
+def get_all_affiliation_stats(db: Session, top_patterns: int = 10) -> Dict[str, dict]:
+    """
+    Statistics for every affiliation, in the shape of get_affiliation_stats,
+    from three grouped queries regardless of the number of affiliations.
+
+    Returns:
+        Dict: Affiliation to its stats, plus a "characters" list of rows
+            (affiliation, character_name, gc_content, power_level) for charts
+    """
+    stats: Dict[str, dict] = {}
+
+    def affiliation_stats(affiliation: str) -> dict:
+        if affiliation not in stats:
+            stats[affiliation] = {
+                "gc_content_by_character": {},
+                "common_patterns": [],
+                "power_level_distribution": {"low": 0, "medium": 0, "high": 0},
+                "characters": []
+            }
+        return stats[affiliation]
+
+    # GC content by character, without loading sequences
+    characters = db.query(Character.affiliation, Character.character_name, Character.gc_content, Character.power_level)\
+        .order_by(Character.id)\
+        .all()
+    for character in characters:
+        entry = affiliation_stats(character.affiliation)
+        entry["gc_content_by_character"][character.character_name] = character.gc_content
+        entry["characters"].append(character)
+
+    # Power level distribution
+    groups = db.query(Character.affiliation, Character.power_level_group, func.count())\
+        .group_by(Character.affiliation, Character.power_level_group)\
+        .all()
+    for affiliation, group, count in groups:
+        distribution = affiliation_stats(affiliation)["power_level_distribution"]
+        if group in distribution:
+            distribution[group] = count
+
+    # Common patterns: totals per (affiliation, motif), ranked within each affiliation.
+    # Grouping on pattern_id first follows the link table's primary key order,
+    # which keeps the grouping B-tree's inserts nearly sorted.
+    totals = db.query(
+        CharacterPattern.pattern_id,
+        Character.affiliation,
+        func.sum(CharacterPattern.count).label('total_count')
+    ).join(Character, Character.id == CharacterPattern.character_id)\
+        .group_by(CharacterPattern.pattern_id, Character.affiliation)\
+        .subquery()
+    ranked = db.query(
+        totals,
+        func.row_number().over(
+            partition_by=totals.c.affiliation,
+            order_by=(totals.c.total_count.desc(), totals.c.pattern_id)
+        ).label('rank')
+    ).subquery()
+    patterns = db.query(ranked.c.affiliation, PatternDictionary.pattern, ranked.c.total_count)\
+        .join(PatternDictionary, PatternDictionary.id == ranked.c.pattern_id)\
+        .filter(ranked.c.rank <= top_patterns)\
+        .order_by(ranked.c.affiliation, ranked.c.rank)\
+        .all()
+    for affiliation, pattern, total_count in patterns:
+        affiliation_stats(affiliation)["common_patterns"].append({pattern: total_count})
+
+    return stats
+
 def get_affiliation_stats(db: Session, affiliation: str):
     # Get GC content by character for the affiliation
     characters = db.query(Character).filter(Character.affiliation == affiliation).all()
@@ -75,13 +322,12 @@ def get_affiliation_stats(db: Session, affiliation: str):
     }
 
     # Get common patterns for the affiliation
-    patterns = db.query(Pattern.pattern, func.sum(Pattern.count).label('total_count'))\
-        .join(Character)\
-        .filter(Character.affiliation == affiliation)\
-        .group_by(Pattern.pattern)\
-        .order_by(func.sum(Pattern.count).desc())\
-        .limit(10)\
-        .all()
+    patterns = _top_patterns(
+        db.query(CharacterPattern.pattern_id, func.sum(CharacterPattern.count).label('total_count'))
+            .join(Character)
+            .filter(Character.affiliation == affiliation),
+        db, 10
+    )
     common_patterns = [{p[0]: p[1]} for p in patterns]
 
     # Get power level distribution for the affiliation
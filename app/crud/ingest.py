@@ -0,0 +1,148 @@
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, select, update, text
+from sqlalchemy.orm import Session
+
+from app.crud.character import PATTERN_LOOKUP_CHUNK_SIZE
+from app.models.character import AffiliationSpectrum, Character, CharacterPattern, CharacterSpectrum, PatternDictionary
+from app.models.ingest import IngestBatch
+
+class CheckpointMismatchError(Exception):
+    """Raised when a chunk does not start where the stored checkpoint ends."""
+
+def get_batch(db: Session, batch_id: int) -> Optional[IngestBatch]:
+    return db.query(IngestBatch).filter(IngestBatch.id == batch_id).first()
+
+def get_batch_by_hash(db: Session, archive_hash: str) -> Optional[IngestBatch]:
+    return db.query(IngestBatch).filter(IngestBatch.archive_hash == archive_hash).first()
+
+def get_batches(db: Session) -> List[IngestBatch]:
+    return db.query(IngestBatch).order_by(IngestBatch.id).all()
+
+def advance_checkpoint(
+    db: Session,
+    archive_hash: str,
+    start: Tuple[int, int],
+    end: Tuple[int, int],
+    member_name: Optional[str] = None,
+    completed: bool = False,
+    source: Optional[str] = None
+) -> IngestBatch:
+    """
+    Move an archive's checkpoint from start to end, creating its batch on the first chunk.
+
+    Refuses to advance if the stored position is not start, so a chunk that
+    failed can never be skipped over by the chunks queued behind it.
+    """
+    batch = get_batch_by_hash(db, archive_hash)
+    stored = (batch.member_index, batch.record_offset) if batch else (0, 0)
+    if stored != start:
+        raise CheckpointMismatchError(
+            f"Checkpoint for archive {archive_hash} is at {stored}, expected {start}"
+        )
+
+    if not batch:
+        batch = IngestBatch(archive_hash=archive_hash, source=source, character_count=0, pattern_count=0)
+        db.add(batch)
+    batch.member_index, batch.record_offset = end
+    batch.member_name = member_name
+    batch.completed = completed
+    db.flush()
+    return batch
+
+def release_characters(db: Session, character_ids: List[int]) -> int:
+    """
+    Take characters and their pattern rows off their batches' counts, before
+    an upsert moves them to another batch.
+
+    Returns:
+        int: Number of pattern rows the characters have
+    """
+    characters: Dict[int, int] = {}
+    patterns: Dict[int, int] = {}
+    pattern_rows = 0
+    for i in range(0, len(character_ids), PATTERN_LOOKUP_CHUNK_SIZE):
+        chunk = character_ids[i:i + PATTERN_LOOKUP_CHUNK_SIZE]
+        for batch_id, count in db.query(Character.batch_id, func.count())\
+                .filter(Character.id.in_(chunk))\
+                .group_by(Character.batch_id):
+            characters[batch_id] = characters.get(batch_id, 0) + count
+        for batch_id, count in db.query(CharacterPattern.batch_id, func.count())\
+                .filter(CharacterPattern.character_id.in_(chunk))\
+                .group_by(CharacterPattern.batch_id):
+            patterns[batch_id] = patterns.get(batch_id, 0) + count
+            pattern_rows += count
+
+    # Rows stored before ingest batches existed have no batch to adjust
+    for batch_id in (set(characters) | set(patterns)) - {None}:
+        db.execute(
+            update(IngestBatch)
+                .where(IngestBatch.id == batch_id)
+                .values(
+                    character_count=IngestBatch.character_count - characters.get(batch_id, 0),
+                    pattern_count=IngestBatch.pattern_count - patterns.get(batch_id, 0)
+                ),
+            execution_options={"synchronize_session": False}
+        )
+    return pattern_rows
+
+def _subtract_pattern_totals(db: Session, batch_id: int) -> None:
+    """Remove a batch's contribution from the dictionary's running totals."""
+    batch_totals = select(func.sum(CharacterPattern.count))\
+        .where(CharacterPattern.batch_id == batch_id, CharacterPattern.pattern_id == PatternDictionary.id)\
+        .scalar_subquery()
+    db.execute(
+        update(PatternDictionary)
+            .where(PatternDictionary.id.in_(select(CharacterPattern.pattern_id).where(CharacterPattern.batch_id == batch_id)))
+            .values(total_count=PatternDictionary.total_count - batch_totals),
+        execution_options={"synchronize_session": False}
+    )
+    # Motifs no character references any more
+    db.query(PatternDictionary).filter(PatternDictionary.total_count <= 0).delete(synchronize_session=False)
+
+def _rebuild_without_batch(db: Session, table_name: str, batch_id: int) -> None:
+    # Copy the surviving rows aside and truncate: cheaper than a row-by-row
+    # DELETE with index maintenance when the batch is a large share of the table
+    db.execute(text(f"CREATE TEMP TABLE purge_keep AS SELECT * FROM {table_name} WHERE batch_id IS NOT :batch_id"), {"batch_id": batch_id})
+    db.execute(text(f"DELETE FROM {table_name}"))
+    db.execute(text(f"INSERT INTO {table_name} SELECT * FROM purge_keep"))
+    db.execute(text("DROP TABLE purge_keep"))
+
+def purge_batch(db: Session, batch_id: int, rebuild: bool = False) -> Optional[IngestBatch]:
+    """
+    Delete every row produced by a batch, and the batch itself.
+
+    Args:
+        db: SQLAlchemy database session
+        batch_id: The batch to purge
+        rebuild: Rebuild the tables from the surviving rows instead of deleting
+            the batch's rows, for batches that make up most of the data
+
+    Returns:
+        IngestBatch: The purged batch, or None if it does not exist
+    """
+    batch = get_batch(db, batch_id)
+    if not batch:
+        return None
+
+    _subtract_pattern_totals(db, batch_id)
+    # Imported here: it needs numpy, which request handling otherwise never loads
+    from app.crud.spectrum import remove_batch_spectra
+    remove_batch_spectra(db, batch_id)
+    if rebuild:
+        _rebuild_without_batch(db, CharacterPattern.__tablename__, batch_id)
+        _rebuild_without_batch(db, Character.__tablename__, batch_id)
+    else:
+        db.query(CharacterPattern).filter(CharacterPattern.batch_id == batch_id).delete(synchronize_session=False)
+        db.query(Character).filter(Character.batch_id == batch_id).delete(synchronize_session=False)
+    db.delete(batch)
+    db.flush()
+    return batch
+
+def purge_all(db: Session) -> None:
+    """Delete all characters, patterns, spectra and batches. Unfiltered deletes let SQLite truncate."""
+    db.query(CharacterPattern).delete(synchronize_session=False)
+    db.query(CharacterSpectrum).delete(synchronize_session=False)
+    db.query(AffiliationSpectrum).delete(synchronize_session=False)
+    db.query(Character).delete(synchronize_session=False)
+    db.query(PatternDictionary).delete(synchronize_session=False)
+    db.query(IngestBatch).delete(synchronize_session=False)
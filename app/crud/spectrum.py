@@ -0,0 +1,85 @@
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.models.character import AffiliationSpectrum, Character, CharacterSpectrum
+from app.utils.spectrum import decode_spectrum, decode_totals, encode_totals
+
+# Stay well below SQLite's bound-parameter limit for IN (...) lookups
+SPECTRUM_LOOKUP_CHUNK_SIZE = 500
+
+def _adjust_affiliation_totals(db: Session, deltas: Dict[Tuple[str, int], Tuple[np.ndarray, int]], sign: int) -> None:
+    """Add (sign=1) or subtract (sign=-1) summed spectra and character counts per (affiliation, k)."""
+    for (affiliation, k), (counts, character_count) in deltas.items():
+        row = db.get(AffiliationSpectrum, (affiliation, k))
+        if row is None:
+            row = AffiliationSpectrum(affiliation=affiliation, k=k, character_count=0, counts=encode_totals(np.zeros_like(counts)))
+            db.add(row)
+        row.counts = encode_totals(decode_totals(row.counts) + sign * counts)
+        row.character_count += sign * character_count
+        if row.character_count <= 0:
+            db.delete(row)
+    db.flush()
+
+def add_spectra(db: Session, k: int, spectra: List[Tuple[int, str, bytes]]) -> None:
+    """
+    Store encoded spectra for new characters and add them to their affiliations' sums.
+
+    Args:
+        db: SQLAlchemy database session
+        k: k-mer length of the spectra
+        spectra: (character id, affiliation, encoded spectrum) triples
+    """
+    if not spectra:
+        return
+    db.execute(insert(CharacterSpectrum), [
+        {'character_id': character_id, 'k': k, 'counts': blob} for character_id, _, blob in spectra
+    ])
+    deltas = {}
+    for _, affiliation, blob in spectra:
+        counts, character_count = deltas.get((affiliation, k), (0, 0))
+        deltas[(affiliation, k)] = (counts + decode_spectrum(blob, k), character_count + 1)
+    _adjust_affiliation_totals(db, deltas, 1)
+
+def _remove_spectra(db: Session, condition) -> None:
+    deltas = defaultdict(lambda: (0, 0))
+    rows = db.execute(
+        select(Character.affiliation, CharacterSpectrum.k, CharacterSpectrum.counts)
+            .join(Character, Character.id == CharacterSpectrum.character_id)
+            .where(condition)
+    )
+    for affiliation, k, blob in rows:
+        counts, character_count = deltas[(affiliation, k)]
+        deltas[(affiliation, k)] = (counts + decode_spectrum(blob, k), character_count + 1)
+    _adjust_affiliation_totals(db, dict(deltas), -1)
+    db.query(CharacterSpectrum).filter(
+        CharacterSpectrum.character_id.in_(select(Character.id).where(condition))
+    ).delete(synchronize_session=False)
+
+def remove_spectra(db: Session, character_ids: List[int]) -> None:
+    """Delete characters' spectra and subtract them from their affiliations' sums."""
+    for i in range(0, len(character_ids), SPECTRUM_LOOKUP_CHUNK_SIZE):
+        _remove_spectra(db, Character.id.in_(character_ids[i:i + SPECTRUM_LOOKUP_CHUNK_SIZE]))
+
+def remove_batch_spectra(db: Session, batch_id: int) -> None:
+    """remove_spectra for every character of an ingest batch."""
+    _remove_spectra(db, Character.batch_id == batch_id)
+
+def get_character_spectrum(db: Session, character_id: int) -> Optional[CharacterSpectrum]:
+    return db.get(CharacterSpectrum, character_id)
+
+def get_affiliation_spectrum(db: Session, affiliation: str, k: int) -> Optional[AffiliationSpectrum]:
+    return db.get(AffiliationSpectrum, (affiliation, k))
+
+def get_characters_without_spectrum(db: Session, k: int, after_id: int, limit: int):
+    """Id, affiliation and sequence of characters without a k spectrum, in id order after after_id."""
+    return db.query(Character.id, Character.affiliation, Character.genetic_sequence)\
+        .outerjoin(CharacterSpectrum, CharacterSpectrum.character_id == Character.id)\
+        .filter(Character.id > after_id)\
+        .filter((CharacterSpectrum.character_id.is_(None)) | (CharacterSpectrum.k != k))\
+        .order_by(Character.id)\
+        .limit(limit)\
+        .all()
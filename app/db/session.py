@@ -1,14 +1,101 @@
-from sqlalchemy import create_engine
+import os
+import sys
+import time
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
+from app.utils.logger import logger
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _call_site() -> str:
+    """First application frame outside the database layer that led to the current statement."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APP_DIR) and not filename.startswith(os.path.join(APP_DIR, "db")):
+            return f"{os.path.relpath(filename, os.path.dirname(APP_DIR))}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+def _log_slow_queries(engine, threshold_ms: int):
+    """Log statements slower than threshold_ms with their parameters and call site."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["query_start_time"].pop()) * 1000
+        if elapsed_ms < threshold_ms:
+            return
+        rendered_parameters = repr(parameters)
+        if len(rendered_parameters) > 500:
+            rendered_parameters = rendered_parameters[:500] + "..."
+        logger.warning(
+            f"Slow query ({elapsed_ms:.1f} ms{', executemany' if executemany else ''}) at {_call_site()}: "
+            f"{' '.join(statement.split())} | parameters: {rendered_parameters}"
+        )
+
+def _configure_sqlite(engine, begin_statement: str = "BEGIN", query_only: bool = False):
+    """
+    Apply WAL mode and connection pragmas, and take over transaction control
+    from pysqlite so that BEGIN/SAVEPOINT are emitted exactly as requested.
+    """
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        if query_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def on_begin(connection):
+        connection.exec_driver_sql(begin_statement)
+
+def _create_engine(**kwargs):
+    if settings.SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+        kwargs.setdefault("connect_args", {})["check_same_thread"] = False
+    return create_engine(settings.SQLALCHEMY_DATABASE_URL, **kwargs)
+
+# General purpose engine (auth, scripts, schema creation)
+engine = _create_engine()
+
+# Read-only engine for stats queries; with WAL these never wait on the writer
+read_engine = _create_engine()
+
+# Dedicated connection used by the single writer thread (see app.db.writer)
+write_engine = _create_engine(pool_size=1, max_overflow=0)
+
+if engine.dialect.name == "sqlite":
+    _configure_sqlite(engine)
+    _configure_sqlite(read_engine, query_only=True)
+    _configure_sqlite(write_engine, begin_statement="BEGIN IMMEDIATE")
+
+if settings.SLOW_QUERY_THRESHOLD_MS > 0:
+    for _engine in (engine, read_engine, write_engine):
+        _log_slow_queries(_engine, settings.SLOW_QUERY_THRESHOLD_MS)
 
-engine = create_engine(settings.SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+# Objects returned by write batches are handed to other threads, keep them loaded
+WriteSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=write_engine)
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
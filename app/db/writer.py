@@ -0,0 +1,253 @@
+import itertools
+import pickle
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import partial
+from multiprocessing.connection import Client, Listener
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import WriteSessionLocal
+from app.utils.logger import logger
+from app.utils.metrics import DB_GROUP_COMMIT_BATCHES, DB_WRITE_QUEUE_DEPTH, INGEST_STAGE_SECONDS
+
+_STOP = object()
+
+class WriteRequest:
+    def __init__(self, fn: Callable[[Session], Any]):
+        self.fn = fn
+        self.future: Future = Future()
+
+class DatabaseWriter:
+    """
+    Single writer thread that owns the only write connection.
+
+    Producers hand over batches as callables taking a Session. The writer runs
+    every batch that is waiting (up to DB_GROUP_COMMIT_MAX_BATCHES) inside its
+    own savepoint and commits the whole group at once, so concurrent ingests
+    share one fsync instead of fighting over the database lock.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = WriteSessionLocal,
+        max_pending: int = settings.DB_WRITE_QUEUE_SIZE,
+        max_group_size: int = settings.DB_GROUP_COMMIT_MAX_BATCHES,
+        group_wait_ms: int = settings.DB_GROUP_COMMIT_WAIT_MS
+    ):
+        self.session_factory = session_factory
+        self.max_group_size = max_group_size
+        self.group_wait = group_wait_ms / 1000
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+            self._thread.start()
+            logger.info("Database writer started.")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Commit everything already queued, then stop the writer thread."""
+        with self._lock:
+            if not self._thread:
+                return
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+            logger.info("Database writer stopped.")
+
+    def submit(self, fn: Callable[[Session], Any]) -> Future:
+        """
+        Queue a write batch. Blocks while the queue is full.
+
+        Returns:
+            Future: Resolves to the batch's return value once it is committed
+        """
+        self.start()
+        request = WriteRequest(fn)
+        self._queue.put(request)
+        DB_WRITE_QUEUE_DEPTH.set(self._queue.qsize())
+        return request.future
+
+    def write(self, fn: Callable[[Session], Any]) -> Any:
+        """Queue a write batch and wait until it is committed."""
+        return self.submit(fn).result()
+
+    def _run(self) -> None:
+        db = self.session_factory()
+        try:
+            stopping = False
+            while not stopping:
+                first = self._queue.get()
+                if first is _STOP:
+                    break
+                group = [first]
+                deadline = time.monotonic() + self.group_wait
+                while len(group) < self.max_group_size:
+                    try:
+                        item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    group.append(item)
+                DB_WRITE_QUEUE_DEPTH.set(self._queue.qsize())
+                self._commit_group(db, group)
+        finally:
+            db.close()
+
+    def _commit_group(self, db: Session, group: List[WriteRequest]) -> None:
+        DB_GROUP_COMMIT_BATCHES.observe(len(group))
+        outcomes = []
+        for request in group:
+            try:
+                with INGEST_STAGE_SECONDS.time("write"), db.begin_nested():
+                    outcomes.append((request, request.fn(db), None))
+            except Exception as e:
+                outcomes.append((request, None, e))
+
+        try:
+            with INGEST_STAGE_SECONDS.time("commit"):
+                db.commit()
+        except Exception as e:
+            logger.exception(f"Group commit of {len(group)} batches failed: {e}")
+            db.rollback()
+            for request in group:
+                request.future.set_exception(e)
+            return
+        finally:
+            db.expunge_all()
+
+        for request, result, error in outcomes:
+            if error is not None:
+                request.future.set_exception(error)
+            else:
+                request.future.set_result(result)
+
+db_writer = DatabaseWriter()
+
+class RemoteWriter:
+    """
+    Stand-in for DatabaseWriter in processes that must not open their own
+    write connection: batches are sent to the process running serve_writes
+    at address, and a thread resolves their futures as replies come back.
+    Batches must pickle, i.e. be module-level functions or partials of them
+    over plain data. If the serving process goes away, pending batches fail
+    with ConnectionError and the next batch reconnects.
+    """
+
+    def __init__(self, address: str, connect_timeout: float = 30.0):
+        self.address = address
+        self.connect_timeout = connect_timeout
+        self._ids = itertools.count()
+        self._pending: Dict[int, Future] = {}
+        self._conn = None
+        self._lock = threading.Lock()
+        # Separate from _lock: a send blocked on a busy writer must not stop replies from being read
+        self._send_lock = threading.Lock()
+
+    def _connect(self):
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                conn = Client(self.address)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                # The writer process is (re)starting
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.1)
+        threading.Thread(target=self._receive, args=(conn,), name="db-writer-replies", daemon=True).start()
+        return conn
+
+    def submit(self, fn: Callable[[Session], Any]) -> Future:
+        """Send a write batch. Blocks while the writer is not reading."""
+        future: Future = Future()
+        with self._send_lock:
+            with self._lock:
+                if self._conn is None:
+                    self._conn = self._connect()
+                conn = self._conn
+                request_id = next(self._ids)
+                self._pending[request_id] = future
+            try:
+                conn.send((request_id, fn))
+            except OSError as e:
+                with self._lock:
+                    self._pending.pop(request_id, None)
+                raise ConnectionError(f"Database writer process went away: {e}") from e
+        return future
+
+    def write(self, fn: Callable[[Session], Any]) -> Any:
+        """Send a write batch and wait until it is committed."""
+        return self.submit(fn).result()
+
+    def _receive(self, conn) -> None:
+        try:
+            while True:
+                request_id, result, error = conn.recv()
+                with self._lock:
+                    future = self._pending.pop(request_id, None)
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+        except (EOFError, OSError):
+            pass
+        with self._lock:
+            if self._conn is conn:
+                self._conn = None
+            pending, self._pending = self._pending, {}
+        conn.close()
+        for future in pending.values():
+            future.set_exception(ConnectionError("Database writer process went away"))
+
+def _send_reply(conn, send_lock: threading.Lock, request_id: int, future: Future) -> None:
+    error = future.exception()
+    if error is not None:
+        try:
+            pickle.dumps(error)
+        except Exception:
+            error = RuntimeError(f"{type(error).__name__}: {error}")
+    try:
+        with send_lock:
+            conn.send((request_id, None if error is not None else future.result(), error))
+    except OSError:
+        # The client died; its batches were committed all the same
+        pass
+
+def _serve_client(conn, writer: DatabaseWriter) -> None:
+    send_lock = threading.Lock()
+    try:
+        while True:
+            request_id, fn = conn.recv()
+            writer.submit(fn).add_done_callback(partial(_send_reply, conn, send_lock, request_id))
+    except (EOFError, OSError):
+        pass
+    except Exception as e:
+        logger.exception(f"Dropping a database writer client: {e}")
+    finally:
+        conn.close()
+
+def serve_writes(address: str, writer: DatabaseWriter = db_writer) -> None:
+    """
+    Commit the batches of RemoteWriter clients connecting to address through
+    writer, answering each on its own connection. Runs until interrupted.
+    """
+    with Listener(address) as listener:
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                # A failed handshake only concerns that client
+                logger.warning(f"Rejected a database writer client: {e}")
+                continue
+            threading.Thread(target=_serve_client, args=(conn, writer), name="db-writer-client", daemon=True).start()
@@ -0,0 +1,247 @@
+"""
+Offline bulk ingest of local archives, bypassing S3 and SQS.
+
+Usage:
+    python -m app.ingest <directory> [--processes N] [--batch-size N]
+
+Archive members are parsed and analyzed across a process pool; results are
+fed, in archive and member order, to the single database writer so that
+batches and checkpoints behave exactly as for uploads (completed archives
+are skipped and interrupted ones resume).
+"""
+import argparse
+import hashlib
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.db.base_class import Base
+from app.db.session import engine
+from app.db.writer import db_writer
+# Register every table before create_all
+from app.models import character as character_models, ingest as ingest_models, user as user_models  # noqa: F401
+from app.services.processing import (
+    ArchiveIngest, analyze_character, is_data_member, load_checkpoint, load_sequence_hashes, parse_genetic_file,
+    refresh_snapshot, write_chunk
+)
+from app.utils.logger import logger
+
+class ThroughputReport:
+    """Counters and per-stage timings, printed as a live status line."""
+
+    STAGES = ["unzip", "parse", "analyze", "write"]
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.archives = 0
+        self.failed = 0
+        self.characters = 0
+        self.bytes = 0
+        self.stage_seconds = {stage: 0.0 for stage in self.STAGES}
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stage_seconds[stage] += seconds
+
+    def line(self) -> str:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        stages = " ".join(f"{stage}={seconds:.1f}s" for stage, seconds in self.stage_seconds.items())
+        return (
+            f"{self.archives} archives ({self.archives / elapsed:.2f}/s), "
+            f"{self.characters} characters ({self.characters / elapsed:.0f}/s), "
+            f"{self.bytes / 1e6:.1f} MB ({self.bytes / 1e6 / elapsed:.2f} MB/s), "
+            f"{self.failed} failed | {stages}"
+        )
+
+def analyze_member(
+    path: str, member_index: int, filename: str, first_record: int, upsert: bool = False
+) -> Tuple[List[Tuple[int, Optional[Tuple]]], int, Dict[str, float]]:
+    """
+    Parse and analyze one archive member. Runs in a worker process. With
+    upsert, patterns are not mined for characters whose stored sequence is unchanged.
+
+    Returns:
+        Tuple: (record offset, analyzed record or None) pairs, the member's
+            total record count, and seconds spent per stage
+    """
+    timings = {}
+    start = time.perf_counter()
+    with zipfile.ZipFile(path) as zip_ref:
+        content = zip_ref.read(filename).decode('utf-8')
+    timings["unzip"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    characters_data = parse_genetic_file(content, filename)
+    timings["parse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    known_hashes = load_sequence_hashes(characters_data[first_record:]) if upsert else None
+    records = [
+        (record_offset, analyze_character(characters_data[record_offset], known_hashes))
+        for record_offset in range(first_record, len(characters_data))
+    ]
+    timings["analyze"] = time.perf_counter() - start
+    return records, len(characters_data), timings
+
+class TimedWriteChunk:
+    """write_chunk wrapper that reports time spent on the writer thread."""
+
+    def __init__(self, report: ThroughputReport):
+        self.report = report
+
+    def __call__(self, db, **kwargs) -> int:
+        start = time.perf_counter()
+        try:
+            return write_chunk(db, **kwargs)
+        finally:
+            self.report.add_stage("write", time.perf_counter() - start)
+
+def find_archives(directory: Path, pattern: str) -> List[Path]:
+    return sorted(path for path in directory.rglob(pattern) if path.is_file())
+
+def ingest_directory(
+    directory: Path,
+    processes: int,
+    batch_size: int = settings.INGEST_BATCH_SIZE,
+    pattern: str = "*.zip",
+    report_interval: float = 1.0,
+    upsert: bool = settings.INGEST_UPSERT
+) -> ThroughputReport:
+    report = ThroughputReport()
+    write_fn = TimedWriteChunk(report)
+    # Bound the work in flight so results waiting for their turn do not pile up
+    max_in_flight = processes * 4
+    in_flight = deque()
+    open_archives = []
+    last_report = 0.0
+
+    def print_report(final: bool = False) -> None:
+        nonlocal last_report
+        now = time.perf_counter()
+        if final or now - last_report >= report_interval:
+            last_report = now
+            print(f"\r{report.line()}", end="\n" if final else "", file=sys.stderr, flush=True)
+
+    def reap_archives(wait: bool = False) -> None:
+        # Count archives whose final chunk has been committed
+        for state in list(open_archives):
+            ingest_state, path, size = state
+            if not (wait or all(future.done() for future in ingest_state.pending)):
+                continue
+            open_archives.remove(state)
+            try:
+                ingest_state.result()
+                report.archives += 1
+                report.bytes += size
+            except Exception as e:
+                logger.exception(f"Error writing archive {path}: {e}")
+                report.failed += 1
+
+    def consume(item) -> None:
+        archive, path, member_index, filename, future, last_member = item
+        if archive.get("failed"):
+            return
+        try:
+            records, total_records, timings = future.result()
+            for stage, seconds in timings.items():
+                report.add_stage(stage, seconds)
+            for record_offset, record in records:
+                archive["ingest"].add((member_index, record_offset + 1), filename, record)
+                if record is not None:
+                    report.characters += 1
+            archive["ingest"].add((member_index, total_records), filename)
+            if last_member:
+                archive["ingest"].close()
+                open_archives.append((archive["ingest"], path, archive["size"]))
+        except Exception as e:
+            logger.exception(f"Error ingesting archive {path}: {e}")
+            archive["failed"] = True
+            report.failed += 1
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+        for path in find_archives(directory, pattern):
+            try:
+                zip_content = path.read_bytes()
+                archive_hash = hashlib.sha256(zip_content).hexdigest()
+                batch_id, resume_from, completed = load_checkpoint(archive_hash)
+                if completed:
+                    logger.info(f"Archive {path} was already ingested as batch {batch_id}, skipping")
+                    continue
+                with zipfile.ZipFile(path) as zip_ref:
+                    members = [
+                        (member_index, filename)
+                        for member_index, filename in enumerate(zip_ref.namelist())
+                        if member_index >= resume_from[0] and is_data_member(filename)
+                    ]
+            except Exception as e:
+                logger.exception(f"Error opening archive {path}: {e}")
+                report.failed += 1
+                continue
+
+            archive = {
+                "ingest": ArchiveIngest(archive_hash, db_writer, path.name, resume_from, batch_size, write_fn, upsert),
+                "size": len(zip_content)
+            }
+            if not members:
+                archive["ingest"].close()
+                open_archives.append((archive["ingest"], path, archive["size"]))
+                continue
+
+            for position, (member_index, filename) in enumerate(members):
+                first_record = resume_from[1] if member_index == resume_from[0] else 0
+                future = pool.submit(analyze_member, str(path), member_index, filename, first_record, upsert)
+                in_flight.append((archive, path, member_index, filename, future, position == len(members) - 1))
+                # Results are consumed in submission order, which keeps every
+                # archive's records in (member, record) order for its checkpoint
+                while len(in_flight) >= max_in_flight:
+                    consume(in_flight.popleft())
+                    reap_archives()
+                    print_report()
+
+        while in_flight:
+            consume(in_flight.popleft())
+            reap_archives()
+            print_report()
+
+    reap_archives(wait=True)
+    print_report(final=True)
+    return report
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.ingest", description="Bulk ingest local genetic data archives")
+    parser.add_argument("directory", type=Path, help="directory searched recursively for archives")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="worker processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=settings.INGEST_BATCH_SIZE, help="characters per committed chunk")
+    parser.add_argument("--pattern", default="*.zip", help="archive file name pattern (default: *.zip)")
+    parser.add_argument("--report-interval", type=float, default=1.0, help="seconds between progress lines")
+    parser.add_argument(
+        "--upsert", action=argparse.BooleanOptionalAction, default=settings.INGEST_UPSERT,
+        help="update characters matched on name and affiliation instead of inserting them (default: INGEST_UPSERT)"
+    )
+    args = parser.parse_args(argv)
+
+    if not args.directory.is_dir():
+        parser.error(f"{args.directory} is not a directory")
+
+    Base.metadata.create_all(bind=engine)
+    try:
+        report = ingest_directory(
+            args.directory, args.processes, args.batch_size, args.pattern, args.report_interval, args.upsert
+        )
+        refresh_snapshot()
+    finally:
+        db_writer.stop()
+    return 1 if report.failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
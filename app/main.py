@@ -3,30 +3,42 @@ import threading
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import PlainTextResponse
 import logging
 
 from app.core.config import settings
-from app.api.v1.endpoints import upload, stats, auth
+from app.api.v1.endpoints import upload, stats, auth, batches
 from app.db.base_class import Base
 from app.db.session import engine, SessionLocal
+from app.db.writer import db_writer
 from app.services.sqs_service import sqs_service
-from app.utils.logger import logger
-
-# Create database tables
-Base.metadata.create_all(bind=engine)
+from app.utils.logger import logger, queue_handler
+from app.utils.metrics import registry
+from app.utils.profiling import ProfilingMiddleware
 
 # Set up SQS processing
 @asynccontextmanager
 async def lifespan(app: FastAPI):
 
-    # Start SQS processor in a background thread
-    thread = threading.Thread(target=sqs_service.process_messages, daemon=True)
-    thread.start()
-    logger.info("SQS background processor started.")
+    # Create database tables here rather than at import, so importing the app stays cheap
+    Base.metadata.create_all(bind=engine)
+
+    # Start the single database writer before any producer can queue batches
+    db_writer.start()
+
+    # Start SQS processor in a background thread, unless app.worker processes consume the queue
+    if settings.SQS_CONSUMER_ENABLED:
+        thread = threading.Thread(target=sqs_service.process_messages, daemon=True)
+        thread.start()
+        logger.info("SQS background processor started.")
 
     # Yield control to FastAPI app
     yield
-    logger.info("SQS background processor stopped.")
+    if settings.SQS_CONSUMER_ENABLED:
+        logger.info("SQS background processor stopped.")
+
+    # Commit whatever is still queued
+    db_writer.stop()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -44,10 +56,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in request profiling
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
 # Include routers
 app.include_router(upload.router, prefix=settings.API_V1_STR)
 app.include_router(stats.router, prefix=settings.API_V1_STR)
 app.include_router(auth.router, prefix=settings.API_V1_STR)
+app.include_router(batches.router, prefix=settings.API_V1_STR)
+
+# Upload target for the presigned URLs of the in-process S3 stand-in
+if settings.AWS_BACKEND == "local":
+    from app.api.local_s3 import router as local_s3_router
+    app.include_router(local_s3_router)
+
+# Prometheus metrics
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
@@ -56,5 +84,5 @@ app.mount("/static", StaticFiles(directory="app/static"), name="static")
 uvicorn_access_logger = logging.getLogger("uvicorn.access")
 uvicorn_error_logger = logging.getLogger("uvicorn.error")
 
-uvicorn_access_logger.addHandler(logger.handlers[1])
-uvicorn_error_logger.addHandler(logger.handlers[1])
\ No newline at end of file
+uvicorn_access_logger.addHandler(queue_handler)
+uvicorn_error_logger.addHandler(queue_handler)
\ No newline at end of file
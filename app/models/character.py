@@ -1,27 +1,69 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, BigInteger, Index, LargeBinary
 from sqlalchemy.orm import relationship
 
 from app.db.base_class import Base
 
 class Character(Base):
     __tablename__ = "characters"
+    # Upsert ingest matches characters on name and affiliation
+    __table_args__ = (Index("ix_characters_name_affiliation", "character_name", "affiliation"),)
 
     id = Column(Integer, primary_key=True, index=True)
     character_name = Column(String, index=True)
     affiliation = Column(String, index=True)
     genetic_sequence = Column(String)
+    # SHA-256 of genetic_sequence; upsert ingest re-mines patterns only when it changes
+    sequence_hash = Column(String(64))
     power_level = Column(Integer)
     gc_content = Column(Float)
     power_level_group = Column(String)
+    batch_id = Column(Integer, ForeignKey("ingest_batches.id"), index=True)
 
-    patterns = relationship("Pattern", back_populates="character")
+    patterns = relationship("CharacterPattern", back_populates="character")
 
-class Pattern(Base):
-    __tablename__ = "patterns"
+class PatternDictionary(Base):
+    """Dictionary of distinct motifs, each stored once."""
+    __tablename__ = "pattern_dictionary"
 
-    id = Column(Integer, primary_key=True, index=True)
-    character_id = Column(Integer, ForeignKey("characters.id"))
-    pattern = Column(String, index=True)
+    id = Column(Integer, primary_key=True)
+    pattern = Column(String, unique=True, nullable=False)
+    length = Column(Integer, nullable=False)
+    # 2-bit packed A/C/G/T encoding for short motifs, NULL otherwise
+    code = Column(BigInteger, index=True)
+    # Sum of counts over all characters, maintained incrementally
+    total_count = Column(Integer, nullable=False, default=0, server_default="0", index=True)
+
+class CharacterPattern(Base):
+    """Occurrence count of a dictionary motif within a character's sequence."""
+    __tablename__ = "character_patterns"
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    pattern_id = Column(Integer, ForeignKey("pattern_dictionary.id"), primary_key=True)
+    character_id = Column(Integer, ForeignKey("characters.id"), primary_key=True, index=True)
     count = Column(Integer)
+    batch_id = Column(Integer, ForeignKey("ingest_batches.id"), index=True)
+
+    character = relationship("Character", back_populates="patterns")
+    motif = relationship("PatternDictionary", lazy="joined")
+
+    @property
+    def pattern(self) -> str:
+        return self.motif.pattern
+
+class CharacterSpectrum(Base):
+    """k-mer count spectrum of a character's sequence (see app.utils.spectrum.encode_spectrum)."""
+    __tablename__ = "character_spectra"
+
+    character_id = Column(Integer, ForeignKey("characters.id"), primary_key=True)
+    k = Column(Integer, nullable=False)
+    counts = Column(LargeBinary, nullable=False)
+
+class AffiliationSpectrum(Base):
+    """Summed k-mer spectra of an affiliation's characters, maintained incrementally."""
+    __tablename__ = "affiliation_spectra"
 
-    character = relationship("Character", back_populates="patterns") 
\ No newline at end of file
+    affiliation = Column(String, primary_key=True)
+    k = Column(Integer, primary_key=True)
+    character_count = Column(Integer, nullable=False, default=0)
+    # Dense little-endian int64 counts (see app.utils.spectrum.encode_totals)
+    counts = Column(LargeBinary, nullable=False)
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy.sql import func
+
+from app.db.base_class import Base
+
+class IngestBatch(Base):
+    """One ingested archive. Every character and pattern row it produced carries its id."""
+    __tablename__ = "ingest_batches"
+    # Never reuse the id of a purged batch
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+    archive_hash = Column(String, unique=True, nullable=False)
+    source = Column(String)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    # Checkpoint: everything before this (member, record) position has been committed
+    member_index = Column(Integer, nullable=False, default=0)
+    member_name = Column(String)
+    record_offset = Column(Integer, nullable=False, default=0)
+    completed = Column(Boolean, nullable=False, default=False)
+
+    # Maintained incrementally as chunks are committed
+    character_count = Column(Integer, nullable=False, default=0)
+    pattern_count = Column(Integer, nullable=False, default=0)
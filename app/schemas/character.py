@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 class CharacterBase(BaseModel):
     character_name: str
@@ -32,8 +32,54 @@ class StatsResponse(BaseModel):
 class AffiliationStatsResponse(StatsResponse):
     pass 
 
+class AffiliationSummary(BaseModel):
+    gc_content_by_character: Dict[str, float]
+    common_patterns: List[Dict[str, int]]
+    power_level_distribution: Dict[str, int]
+    visualizations: Optional[Dict[str, str]] = None
+
+class AllAffiliationStatsResponse(BaseModel):
+    affiliations: Dict[str, AffiliationSummary]
+
 class CharacterStatsResponse(CharacterBase):
     gc_content: float
     power_level_group: str
     patterns: List[PatternBase]
-    id: int
\ No newline at end of file
+    id: int
+
+class GCProfileResponse(BaseModel):
+    character_name: str
+    length: int
+    window: int
+    step: int
+    positions: List[int]
+    gc_content: List[float]
+    gc_skew: List[float]
+
+class CharacterSpectrumResponse(BaseModel):
+    character_name: str
+    k: int
+    total: int
+    counts: Dict[str, int]
+
+class AffiliationSpectrumResponse(BaseModel):
+    affiliation: str
+    k: int
+    character_count: int
+    total: int
+    counts: Dict[str, int]
+
+class KmerEnrichment(BaseModel):
+    kmer: str
+    count_a: int
+    count_b: int
+    frequency_a: float
+    frequency_b: float
+    log2_fold_change: float
+
+class KmerEnrichmentResponse(BaseModel):
+    affiliation_a: str
+    affiliation_b: str
+    k: int
+    enriched_in_a: List[KmerEnrichment]
+    enriched_in_b: List[KmerEnrichment]
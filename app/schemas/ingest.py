@@ -0,0 +1,18 @@
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel
+
+class IngestBatch(BaseModel):
+    id: int
+    archive_hash: str
+    source: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    completed: bool
+    member_index: int
+    record_offset: int
+    character_count: int
+    pattern_count: int
+
+    class Config:
+        from_attributes = True
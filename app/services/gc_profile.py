@@ -0,0 +1,74 @@
+import math
+from typing import Callable, Dict
+
+import numpy as np
+
+from app.core.config import settings
+from app.utils.cache import TTLCache
+
+# Profiles are keyed on the character's id and sequence hash, so an upserted sequence gets a new entry
+profile_cache = TTLCache(max_size=settings.GC_PROFILE_CACHE_SIZE, ttl=settings.GC_PROFILE_CACHE_TTL_SECONDS)
+
+def gc_profile(sequence: str, window: int, step: int, max_points: int = settings.GC_PROFILE_MAX_POINTS) -> Dict[str, object]:
+    """
+    GC content and GC skew of every window along a sequence.
+
+    G and C occurrences are counted with one cumulative sum each, so any
+    window's counts are the difference of two prefix sums and the whole
+    profile costs O(n) whatever the window size. When the sequence has more
+    than max_points windows, the step is widened to stay within max_points.
+
+    Args:
+        sequence: The genetic sequence
+        window: Window length in bases
+        step: Distance between the starts of consecutive windows
+        max_points: Most windows returned
+
+    Returns:
+        Dict: The step used, window start positions, GC content (%) and
+        GC skew ((G - C) / (G + C), 0 for windows without G or C)
+    """
+    window_count = len(sequence) - window + 1
+    if window_count > 0:
+        # Widen the step so that at most max_points windows remain
+        step = max(step, math.ceil(window_count / max_points))
+    starts = np.arange(0, max(window_count, 0), step)
+
+    bases = np.frombuffer(sequence.upper().encode("ascii", errors="replace"), dtype=np.uint8)
+    g_counts = np.concatenate(([0], np.cumsum(bases == ord("G"))))
+    c_counts = np.concatenate(([0], np.cumsum(bases == ord("C"))))
+    g = g_counts[starts + window] - g_counts[starts]
+    c = c_counts[starts + window] - c_counts[starts]
+
+    gc = g + c
+    skew = np.divide(g - c, gc, out=np.zeros(len(starts)), where=gc > 0)
+    return {
+        "step": step,
+        "positions": starts.tolist(),
+        "gc_content": (gc * (100 / window)).tolist(),
+        "gc_skew": skew.tolist()
+    }
+
+def cached_gc_profile(
+    key: tuple, load_sequence: Callable[[], str], window: int, step: int, max_points: int = settings.GC_PROFILE_MAX_POINTS
+) -> Dict[str, object]:
+    """
+    gc_profile through profile_cache.
+
+    Args:
+        key: Identifies the sequence's current version, e.g. (character id, sequence hash)
+        load_sequence: Called on a cache miss to fetch the sequence
+        window: Window length in bases
+        step: Distance between window starts
+        max_points: Most windows returned
+
+    Returns:
+        Dict: The profile plus the sequence length
+    """
+    cache_key = (*key, window, step, max_points)
+    profile = profile_cache.get(cache_key)
+    if profile is None:
+        sequence = load_sequence()
+        profile = {"length": len(sequence), **gc_profile(sequence, window, step, max_points)}
+        profile_cache.set(cache_key, profile)
+    return profile
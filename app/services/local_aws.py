@@ -0,0 +1,141 @@
+"""
+In-process stand-ins for the boto3 S3 and SQS clients, selected with
+AWS_BACKEND=local for load tests and development without AWS.
+
+They implement only the client calls this app makes, with the same
+arguments and response shapes. Objects put to the fake bucket publish an
+S3 ObjectCreated event to the fake queue, as the bucket notification does
+in production. State lives in the process's memory, so uploads must go
+through the API process (see app/api/local_s3.py).
+"""
+import io
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+from app.core.config import settings
+
+# Seconds a received message stays invisible before it is redelivered (SQS default)
+DEFAULT_VISIBILITY_TIMEOUT = 30
+
+def _client_error(code: str, message: str, operation: str) -> ClientError:
+    return ClientError({"Error": {"Code": code, "Message": message}}, operation)
+
+class LocalSQSClient:
+    """A single in-memory queue with long polling and visibility timeouts."""
+
+    def __init__(self, visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT):
+        self.visibility_timeout = visibility_timeout
+        self._visible: deque = deque()
+        # Receipt handle -> (message, time it becomes visible again)
+        self._in_flight: Dict[str, tuple] = {}
+        self._condition = threading.Condition()
+
+    def send_message(self, QueueUrl: str, MessageBody: str, **kwargs) -> Dict:
+        message = {"MessageId": str(uuid.uuid4()), "Body": MessageBody}
+        with self._condition:
+            self._visible.append(message)
+            self._condition.notify()
+        return {"MessageId": message["MessageId"]}
+
+    def _requeue_expired(self) -> None:
+        now = time.monotonic()
+        for receipt_handle, (message, visible_at) in list(self._in_flight.items()):
+            if visible_at <= now:
+                del self._in_flight[receipt_handle]
+                self._visible.appendleft(message)
+
+    def receive_message(
+        self,
+        QueueUrl: str,
+        MaxNumberOfMessages: int = 1,
+        WaitTimeSeconds: int = 0,
+        VisibilityTimeout: Optional[int] = None,
+        **kwargs
+    ) -> Dict:
+        deadline = time.monotonic() + WaitTimeSeconds
+        visibility_timeout = self.visibility_timeout if VisibilityTimeout is None else VisibilityTimeout
+        with self._condition:
+            while True:
+                self._requeue_expired()
+                if self._visible:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return {}
+                # Wake up for redeliveries as well as new messages
+                self._condition.wait(min(remaining, 1.0))
+            messages = []
+            while self._visible and len(messages) < MaxNumberOfMessages:
+                message = self._visible.popleft()
+                receipt_handle = str(uuid.uuid4())
+                self._in_flight[receipt_handle] = (message, time.monotonic() + visibility_timeout)
+                messages.append({**message, "ReceiptHandle": receipt_handle})
+        return {"Messages": messages}
+
+    def delete_message(self, QueueUrl: str, ReceiptHandle: str, **kwargs) -> Dict:
+        with self._condition:
+            self._in_flight.pop(ReceiptHandle, None)
+        return {}
+
+    def change_message_visibility(self, QueueUrl: str, ReceiptHandle: str, VisibilityTimeout: int, **kwargs) -> Dict:
+        with self._condition:
+            entry = self._in_flight.get(ReceiptHandle)
+            if entry is None:
+                raise _client_error("ReceiptHandleIsInvalid", "The receipt handle is not valid.", "ChangeMessageVisibility")
+            self._in_flight[ReceiptHandle] = (entry[0], time.monotonic() + VisibilityTimeout)
+            self._requeue_expired()
+            self._condition.notify()
+        return {}
+
+    def get_queue_attributes(self, QueueUrl: str, AttributeNames: List[str], **kwargs) -> Dict:
+        with self._condition:
+            self._requeue_expired()
+            return {"Attributes": {
+                "ApproximateNumberOfMessages": str(len(self._visible)),
+                "ApproximateNumberOfMessagesNotVisible": str(len(self._in_flight)),
+            }}
+
+class LocalS3Client:
+    """An in-memory bucket store that notifies a queue of new objects."""
+
+    def __init__(self, notify_queue: Optional[LocalSQSClient] = None):
+        self.notify_queue = notify_queue
+        self._objects: Dict[tuple, bytes] = {}
+        self._lock = threading.Lock()
+
+    def generate_presigned_url(self, ClientMethod: str, Params: Dict, ExpiresIn: int = 3600, **kwargs) -> str:
+        # Served by the local S3 route; the fake bucket does not check signatures
+        return f"{settings.LOCAL_S3_ENDPOINT.rstrip('/')}/{Params['Bucket']}/{Params['Key']}"
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes, **kwargs) -> Dict:
+        with self._lock:
+            self._objects[(Bucket, Key)] = bytes(Body)
+        if self.notify_queue is not None:
+            event = {"Records": [{
+                "eventSource": "aws:s3",
+                "eventName": "ObjectCreated:Put",
+                "s3": {"bucket": {"name": Bucket}, "object": {"key": Key, "size": len(Body)}}
+            }]}
+            self.notify_queue.send_message(QueueUrl=settings.AWS_SQS_QUEUE_URL, MessageBody=json.dumps(event))
+        return {}
+
+    def get_object(self, Bucket: str, Key: str, **kwargs) -> Dict:
+        with self._lock:
+            content = self._objects.get((Bucket, Key))
+        if content is None:
+            raise _client_error("NoSuchKey", "The specified key does not exist.", "GetObject")
+        return {"Body": io.BytesIO(content), "ContentLength": len(content)}
+
+    def delete_object(self, Bucket: str, Key: str, **kwargs) -> Dict:
+        with self._lock:
+            self._objects.pop((Bucket, Key), None)
+        return {}
+
+local_sqs = LocalSQSClient()
+local_s3 = LocalS3Client(notify_queue=local_sqs)
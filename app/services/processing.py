@@ -1,12 +1,22 @@
 import re
-from typing import List, Dict, Tuple, Any
+from typing import List, Dict, Tuple, Any, Optional, Callable
+from functools import partial
 import json
 import base64
+import hashlib
 import zipfile
 import io
 from sqlalchemy.orm import Session
 from app.crud import character as crud
-from app.utils.logger import logger
+from app.crud import ingest as crud_ingest
+from app.db.session import ReadSessionLocal, SessionLocal
+from app.db.writer import DatabaseWriter, db_writer
+from app.models.ingest import IngestBatch
+from app.utils.logger import logger, record_logger
+from app.utils.metrics import (
+    INGEST_ARCHIVES, INGEST_BYTES, INGEST_CHARACTERS, INGEST_MEMBERS, INGEST_PATTERNS, INGEST_STAGE_SECONDS,
+    INGEST_UPSERTS
+)
 from app.core.config import settings
 
 def calculate_gc_content(sequence: str) -> float:
@@ -14,6 +24,18 @@ def calculate_gc_content(sequence: str) -> float:
     gc_count = sequence.upper().count('G') + sequence.upper().count('C')
     return (gc_count / len(sequence)) * 100 if sequence else 0
 
+def sequence_hash(sequence: str) -> str:
+    """Fingerprint of a genetic sequence, stored to detect changed characters on upsert."""
+    return hashlib.sha256(sequence.encode('utf-8')).hexdigest()
+
+def encoded_spectrum(sequence: str) -> Optional[bytes]:
+    """The sequence's packed KMER_SPECTRUM_K k-mer spectrum, or None when spectra are disabled."""
+    if not settings.KMER_SPECTRUM_K:
+        return None
+    # numpy is only imported by processes that analyze sequences
+    from app.utils.spectrum import encode_spectrum, kmer_spectrum
+    return encode_spectrum(kmer_spectrum(sequence, settings.KMER_SPECTRUM_K))
+
 def find_repeating_patterns(sequence: str, min_length: int = settings.MIN_PATTERN_LENGTH) -> List[Tuple[str, int]]:
     """Find all repeating patterns in a sequence, incrementally increasing pattern length."""
     patterns = []
@@ -69,17 +91,23 @@ def is_base64_like(content: str) -> bool:
     # Check if the content matches base64 pattern
     return all(base64_pattern.match(line.strip()) for line in content.split('\n') if line.strip())
 
-def parse_genetic_file(content: str, filename: str = None) -> List[Dict]:
-    """Parse genetic data from different file formats."""
-    # Detect file format
+def detect_file_format(content: str, filename: str = None) -> str:
+    """Detect whether a data file is JSON, key-value text or base64-like encoded."""
     if not filename.endswith('.json'):
         if is_base64_like(content):
-            file_format = "base64"
-        else:
-            file_format = "text"
-    else:
-        file_format = "json"
+            return "base64"
+        return "text"
+    return "json"
 
+def parse_genetic_file(content: str, filename: str = None) -> List[Dict]:
+    """Parse genetic data from different file formats."""
+    with INGEST_STAGE_SECONDS.time("sniff"):
+        file_format = detect_file_format(content, filename)
+    with INGEST_STAGE_SECONDS.time("parse"):
+        return parse_genetic_content(content, file_format)
+
+def parse_genetic_content(content: str, file_format: str) -> List[Dict]:
+    """Parse genetic data in an already detected file format."""
     if file_format == "json":
         return json.loads(content)
     elif file_format == "text":
@@ -129,52 +157,507 @@ def parse_genetic_file(content: str, filename: str = None) -> List[Dict]:
     else:
         raise ValueError(f"Unsupported file format: {file_format}")
 
-def process_zip_file(zip_content: bytes, db: Session) -> None:
+def analyze_character(
+    char_data: Dict,
+    known_hashes: Optional[Dict[Tuple[str, str], str]] = None
+) -> Optional[Tuple[Dict, Optional[List[Tuple[str, int]]]]]:
+    """
+    Compute derived fields and patterns for a character, or None if it cannot be stored.
+
+    Args:
+        char_data: The parsed character
+        known_hashes: Stored sequence hashes by (character_name, affiliation), for
+            upsert ingest. Patterns are not mined (None) when the stored sequence is the same.
+    """
+    # Validate required fields
+    required_fields = ['character_name', 'affiliation', 'genetic_sequence', 'power_level']
+    if not all(field in char_data for field in required_fields):
+        return None
+
+    try:
+        with INGEST_STAGE_SECONDS.time("gc"):
+            gc_content = calculate_gc_content(char_data['genetic_sequence'])
+        character_data = {
+            **char_data,
+            'gc_content': gc_content,
+            'power_level_group': determine_power_level_group(char_data['power_level']),
+            'sequence_hash': sequence_hash(char_data['genetic_sequence'])
+        }
+    except Exception as e:
+        record_logger.exception(f"Error creating character {char_data['character_name']} with error: {e}")
+        return None
+
+    INGEST_CHARACTERS.inc()
+    if known_hashes and known_hashes.get((char_data['character_name'], char_data['affiliation'])) == character_data['sequence_hash']:
+        return character_data, None
+
+    try:
+        with INGEST_STAGE_SECONDS.time("patterns"):
+            patterns = find_repeating_patterns(char_data['genetic_sequence'])
+    except Exception as e:
+        record_logger.exception(f"Error processing patterns for character {char_data['character_name']} with error: {e}")
+        patterns = []
+
+    INGEST_PATTERNS.inc(amount=len(patterns))
+
+    try:
+        with INGEST_STAGE_SECONDS.time("spectrum"):
+            character_data['kmer_spectrum'] = encoded_spectrum(char_data['genetic_sequence'])
+    except Exception as e:
+        record_logger.exception(f"Error computing the k-mer spectrum of character {char_data['character_name']} with error: {e}")
+    return character_data, patterns
+
+def store_spectra(db: Session, character_ids: List[int], characters_data: List[Dict]) -> None:
+    """Store the analyzed characters' spectra and add them to their affiliations' sums."""
+    spectra = [
+        (character_id, character_data['affiliation'], character_data['kmer_spectrum'])
+        for character_id, character_data in zip(character_ids, characters_data)
+        if character_data.get('kmer_spectrum') is not None
+    ]
+    if spectra:
+        from app.crud import spectrum as crud_spectrum
+        crud_spectrum.add_spectra(db, settings.KMER_SPECTRUM_K, spectra)
+
+def _stored_hash(row) -> str:
+    # Rows written before sequence hashes were stored come back with their sequence
+    return row.sequence_hash or sequence_hash(row.genetic_sequence or '')
+
+def load_sequence_hashes(characters_data: List[Dict]) -> Dict[Tuple[str, str], str]:
+    """Stored sequence hash for each (character_name, affiliation) in characters_data, for upsert ingest."""
+    keys = [
+        (char_data['character_name'], char_data['affiliation'])
+        for char_data in characters_data
+        if 'character_name' in char_data and 'affiliation' in char_data
+    ]
+    with ReadSessionLocal() as db:
+        return {key: _stored_hash(row) for key, row in crud.get_characters_by_key(db, keys).items()}
+
+def write_characters(
+    db: Session,
+    records: List[Tuple[Dict, List[Tuple[str, int]]]],
+    batch_id: Optional[int] = None
+) -> Tuple[int, int]:
+    """
+    Insert analyzed characters and their patterns. Runs on the database writer thread.
+
+    The whole set is inserted with a few bulk statements; if that fails it
+    is retried one character at a time so a bad record only loses itself.
+
+    Returns:
+        Tuple[int, int]: Number of characters and pattern rows inserted
+    """
+    try:
+        with db.begin_nested():
+            character_ids = crud.create_characters(db, [character_data for character_data, _ in records], batch_id)
+            crud.create_patterns_for_characters(
+                db, [(character_id, patterns) for character_id, (_, patterns) in zip(character_ids, records)], batch_id
+            )
+            store_spectra(db, character_ids, [character_data for character_data, _ in records])
+        return len(records), sum(len(patterns) for _, patterns in records)
+    except Exception as e:
+        logger.warning(f"Bulk insert of {len(records)} characters failed, retrying one at a time: {e}")
+
+    character_count = 0
+    pattern_count = 0
+    for character_data, patterns in records:
+        try:
+            with db.begin_nested():
+                character = crud.create_character(db, character_data, batch_id)
+                store_spectra(db, [character.id], [character_data])
+            character_count += 1
+        except Exception as e:
+            record_logger.exception(f"Error creating character {character_data['character_name']} with error: {e}")
+            continue
+
+        try:
+            with db.begin_nested():
+                crud.create_patterns(db, character.id, patterns, batch_id)
+            pattern_count += len(patterns)
+        except Exception as e:
+            record_logger.exception(f"Error processing patterns for character {character_data['character_name']} with error: {e}")
+            continue
+
+    return character_count, pattern_count
+
+def _upsert_characters(
+    db: Session,
+    records: List[Tuple[Dict, Optional[List[Tuple[str, int]]]]],
+    batch_id: Optional[int] = None
+) -> Tuple[Dict[str, int], int]:
+    # Within a chunk the last record for a character wins
+    latest = {}
+    for character_data, patterns in records:
+        latest[(character_data['character_name'], character_data['affiliation'])] = (character_data, patterns)
+    existing = crud.get_characters_by_key(db, list(latest))
+
+    outcomes = {"inserted": 0, "updated": 0, "reanalyzed": 0, "unchanged": 0}
+    inserts, metadata_updates, sequence_updates = [], [], []
+    for key, (character_data, patterns) in latest.items():
+        row = existing.get(key)
+        if row is not None and _stored_hash(row) == character_data['sequence_hash']:
+            if str(row.power_level) == str(character_data['power_level']):
+                outcomes["unchanged"] += 1
+            else:
+                metadata_updates.append({
+                    'id': row.id,
+                    'power_level': character_data['power_level'],
+                    'power_level_group': character_data['power_level_group'],
+                    'batch_id': batch_id
+                })
+            continue
+        # Analysis skipped mining when the sequence looked unchanged; it has changed since
+        if patterns is None:
+            patterns = find_repeating_patterns(character_data['genetic_sequence'])
+            character_data['kmer_spectrum'] = encoded_spectrum(character_data['genetic_sequence'])
+        if row is None:
+            inserts.append((character_data, patterns))
+        else:
+            sequence_updates.append((row.id, character_data, patterns))
+
+    character_ids = crud.create_characters(db, [character_data for character_data, _ in inserts], batch_id)
+    outcomes["inserted"] = len(character_ids)
+
+    # Updated characters leave their previous batches, which stop counting them
+    moved_patterns = crud_ingest.release_characters(db, [update['id'] for update in metadata_updates])
+    crud_ingest.release_characters(db, [character_id for character_id, _, _ in sequence_updates])
+
+    # Metadata-only changes keep their patterns, moved along to the new batch
+    crud.update_characters(db, metadata_updates)
+    crud.retag_patterns(db, [update['id'] for update in metadata_updates], batch_id)
+    outcomes["updated"] = len(metadata_updates)
+
+    crud.update_characters(db, [
+        {
+            'id': character_id,
+            'genetic_sequence': character_data['genetic_sequence'],
+            'sequence_hash': character_data['sequence_hash'],
+            'gc_content': character_data['gc_content'],
+            'power_level': character_data['power_level'],
+            'power_level_group': character_data['power_level_group'],
+            'batch_id': batch_id
+        }
+        for character_id, character_data, _ in sequence_updates
+    ])
+    crud.delete_patterns_for_characters(db, [character_id for character_id, _, _ in sequence_updates])
+    if sequence_updates:
+        from app.crud import spectrum as crud_spectrum
+        crud_spectrum.remove_spectra(db, [character_id for character_id, _, _ in sequence_updates])
+    outcomes["reanalyzed"] = len(sequence_updates)
+
+    character_patterns = [(character_id, patterns) for character_id, (_, patterns) in zip(character_ids, inserts)]
+    character_patterns += [(character_id, patterns) for character_id, _, patterns in sequence_updates]
+    crud.create_patterns_for_characters(db, character_patterns, batch_id)
+    store_spectra(
+        db,
+        character_ids + [character_id for character_id, _, _ in sequence_updates],
+        [character_data for character_data, _ in inserts] + [character_data for _, character_data, _ in sequence_updates]
+    )
+    return outcomes, moved_patterns + sum(len(patterns) for _, patterns in character_patterns)
+
+def upsert_characters(
+    db: Session,
+    records: List[Tuple[Dict, Optional[List[Tuple[str, int]]]]],
+    batch_id: Optional[int] = None
+) -> Tuple[int, int]:
+    """
+    Write analyzed characters keyed on (character_name, affiliation). Runs on
+    the database writer thread.
+
+    New characters are inserted. Characters whose stored sequence hash matches
+    are skipped, or updated in place if only their power level changed.
+    Characters whose sequence changed are updated and get their patterns
+    replaced. Rows that change are tagged with batch_id, as are their patterns.
+    Like write_characters, a failed bulk write is retried one character at a time.
+
+    Returns:
+        Tuple[int, int]: Number of characters inserted or updated and pattern
+            rows inserted or moved to batch_id
+    """
+    try:
+        with db.begin_nested():
+            outcomes, pattern_count = _upsert_characters(db, records, batch_id)
+    except Exception as e:
+        logger.warning(f"Bulk upsert of {len(records)} characters failed, retrying one at a time: {e}")
+        outcomes = {"inserted": 0, "updated": 0, "reanalyzed": 0, "unchanged": 0}
+        pattern_count = 0
+        for record in records:
+            try:
+                with db.begin_nested():
+                    record_outcomes, record_patterns = _upsert_characters(db, [record], batch_id)
+            except Exception as e:
+                record_logger.exception(f"Error upserting character {record[0]['character_name']} with error: {e}")
+                continue
+            for outcome, count in record_outcomes.items():
+                outcomes[outcome] += count
+            pattern_count += record_patterns
+
+    for outcome, count in outcomes.items():
+        if count:
+            INGEST_UPSERTS.inc(outcome, amount=count)
+    return outcomes["inserted"] + outcomes["updated"] + outcomes["reanalyzed"], pattern_count
+
+def write_chunk(
+    db: Session,
+    archive_hash: str,
+    records: List[Tuple[Dict, Optional[List[Tuple[str, int]]]]],
+    start: Tuple[int, int],
+    end: Tuple[int, int],
+    member_name: Optional[str] = None,
+    completed: bool = False,
+    source: Optional[str] = None,
+    upsert: bool = False
+) -> int:
+    """
+    Write a chunk of an archive and advance its batch's checkpoint and
+    counters in the same transaction.
+
+    Returns:
+        int: The archive's ingest batch id
+    """
+    batch = crud_ingest.advance_checkpoint(db, archive_hash, start, end, member_name, completed, source)
+    write = upsert_characters if upsert else write_characters
+    character_count, pattern_count = write(db, records, batch.id)
+    # SQL increments: an upsert may have taken rows off this batch's counts with an UPDATE
+    batch.character_count = IngestBatch.character_count + character_count
+    batch.pattern_count = IngestBatch.pattern_count + pattern_count
+    db.flush()
+    return batch.id
+
+def is_data_member(filename: str) -> bool:
+    """Check whether an archive member holds genetic data."""
+    if not any(filename.endswith(ext) for ext in ['.json', '.txt', '.b64']):
+        return False
+    if any(filename.startswith(ext) for ext in ['.', '..', '__MACOSX']):
+        return False
+    return True
+
+def load_checkpoint(archive_hash: str) -> Tuple[Optional[int], Tuple[int, int], bool]:
+    """
+    Look up an archive's ingest batch.
+
+    Returns:
+        Tuple: The batch id (None if never seen), the (member, record) position
+            to resume from, and whether the archive was completely ingested
+    """
+    with SessionLocal() as db:
+        batch = crud_ingest.get_batch_by_hash(db, archive_hash)
+        if not batch:
+            return None, (0, 0), False
+        return batch.id, (batch.member_index, batch.record_offset), batch.completed
+
+class ArchiveIngest:
+    """
+    Feeds one archive's analyzed records to the database writer in chunks of
+    batch_size, each advancing the archive's checkpoint from where the
+    previous chunk ended. Records must be added in (member, record) order.
+    """
+
+    def __init__(
+        self,
+        archive_hash: str,
+        writer: DatabaseWriter = db_writer,
+        source: Optional[str] = None,
+        resume_from: Tuple[int, int] = (0, 0),
+        batch_size: int = settings.INGEST_BATCH_SIZE,
+        write_fn: Callable[..., int] = write_chunk,
+        upsert: bool = False
+    ):
+        self.archive_hash = archive_hash
+        self.writer = writer
+        self.source = source
+        self.batch_size = batch_size
+        self.write_fn = write_fn
+        self.upsert = upsert
+        self.committed = resume_from
+        self.position = resume_from
+        self.member_name = None
+        self.batch = []
+        self.pending = []
+
+    def add(self, position: Tuple[int, int], member_name: str, record: Optional[Tuple] = None) -> None:
+        """Move past the record at position, queueing it unless it was rejected (None)."""
+        self.position = position
+        self.member_name = member_name
+        if record is not None:
+            self.batch.append(record)
+            if len(self.batch) >= self.batch_size:
+                self.flush()
+
+    def flush(self, completed: bool = False) -> None:
+        # Stop early if a chunk already failed; later chunks would be refused anyway
+        for future in self.pending:
+            if future.done() and future.exception():
+                raise future.exception()
+        if self.batch or completed:
+            # Time blocked on a full writer queue shows up as flush time
+            with INGEST_STAGE_SECONDS.time("flush"):
+                self.pending.append(self.writer.submit(partial(
+                    self.write_fn,
+                    archive_hash=self.archive_hash,
+                    records=self.batch,
+                    start=self.committed,
+                    end=self.position,
+                    member_name=self.member_name,
+                    completed=completed,
+                    source=self.source,
+                    upsert=self.upsert
+                )))
+            self.committed = self.position
+            self.batch = []
+
+    def close(self) -> None:
+        """Queue the remaining records and mark the archive completed, without waiting."""
+        self.flush(completed=True)
+
+    def result(self) -> int:
+        """Wait until every chunk is committed, surfacing the first failure, and return the batch id."""
+        for future in self.pending:
+            batch_id = future.result()
+        return batch_id
+
+def process_zip_file(
+    zip_content: bytes,
+    writer: DatabaseWriter = db_writer,
+    source: Optional[str] = None,
+    upsert: Optional[bool] = None
+) -> int:
     """
     Process a ZIP file containing genetic data files.
+
+    Characters are analyzed on the calling thread and handed to the database
+    writer in chunks of INGEST_BATCH_SIZE, so analysis of the next chunk
+    overlaps with the commit of the previous one. Every archive is one ingest
+    batch; each chunk also records the batch's checkpoint (member index and
+    record offset), so processing the same archive again resumes after the
+    last committed chunk and a fully ingested archive is skipped.
+
+    In upsert mode characters are matched on name and affiliation instead
+    of always inserted, and patterns are only mined for new characters and
+    characters whose sequence changed (see upsert_characters).
     
     Args:
         zip_content: The ZIP file content as bytes
-        db: SQLAlchemy database session
+        writer: Database writer that commits the chunks
+        source: Where the archive came from (S3 key or file name), stored on the batch
+        upsert: Upsert instead of insert characters (default: INGEST_UPSERT)
+
+    Returns:
+        int: The archive's ingest batch id
     """
+    archive_hash = hashlib.sha256(zip_content).hexdigest()
+    batch_id, resume_from, completed = load_checkpoint(archive_hash)
+    if completed:
+        logger.info(f"Archive {source or archive_hash} was already ingested as batch {batch_id}, skipping")
+        INGEST_ARCHIVES.inc("skipped")
+        return batch_id
+    if resume_from != (0, 0):
+        logger.info(f"Resuming archive {archive_hash} at member {resume_from[0]}, record {resume_from[1]}")
+
+    if upsert is None:
+        upsert = settings.INGEST_UPSERT
+    ingest = ArchiveIngest(archive_hash, writer, source, resume_from, upsert=upsert)
+
     with zipfile.ZipFile(io.BytesIO(zip_content)) as zip_ref:
-        for filename in zip_ref.namelist():
-            # Skip non-data files
-            if not any(filename.endswith(ext) for ext in ['.json', '.txt', '.b64']):
-                continue
-            if any(filename.startswith(ext) for ext in ['.', '..', '__MACOSX']):
+        for member_index, filename in enumerate(zip_ref.namelist()):
+            # Skip members committed before a previous attempt stopped
+            if member_index < resume_from[0] or not is_data_member(filename):
                 continue
 
             # Read file content
-            content = zip_ref.read(filename).decode('utf-8')
+            with INGEST_STAGE_SECONDS.time("unzip"):
+                content = zip_ref.read(filename).decode('utf-8')
+            INGEST_MEMBERS.inc()
             
             # Process the file content
             characters_data = parse_genetic_file(content, filename)
+            first_record = resume_from[1] if member_index == resume_from[0] else 0
+            known_hashes = load_sequence_hashes(characters_data[first_record:]) if upsert else None
+
+            for record_offset in range(first_record, len(characters_data)):
+                ingest.add(
+                    (member_index, record_offset + 1),
+                    filename,
+                    analyze_character(characters_data[record_offset], known_hashes)
+                )
+
+    ingest.close()
+    try:
+        batch_id = ingest.result()
+    except Exception:
+        INGEST_ARCHIVES.inc("failed")
+        raise
+    INGEST_ARCHIVES.inc("completed")
+    INGEST_BYTES.inc(amount=len(zip_content))
+    refresh_snapshot()
+    return batch_id
+
+def _purge_archive(db: Session, archive_hash: str):
+    batch = crud_ingest.get_batch_by_hash(db, archive_hash)
+    return crud_ingest.purge_batch(db, batch.id) if batch else None
+
+class BatchReplaceError(Exception):
+    """Raised when an archive cannot replace a batch. The batch is left in place."""
+
+def replace_batch(
+    batch_id: int,
+    zip_content: bytes,
+    source: Optional[str] = None,
+    rebuild: bool = False,
+    writer: DatabaseWriter = db_writer
+) -> Optional[int]:
+    """
+    Ingest an archive as a new batch, then purge the batch it replaces.
+
+    The old batch is only purged once the new one has committed, so a corrupt
+    archive or a failed ingest leaves the old batch untouched. Chunks of the
+    new archive committed before a failure are purged again. The archive is
+    always inserted, never upserted: an upsert would move characters of the
+    old batch into the new one, and purging either batch would then delete them.
+
+    Args:
+        batch_id: The batch to replace
+        zip_content: The replacement archive
+        source: Where the archive came from, stored on the new batch
+        rebuild: Purge the old batch by rebuilding the tables (see purge_batch)
+        writer: Database writer that commits the chunks and the purge
+
+    Returns:
+        int: The new batch id, or None if batch_id does not exist
+
+    Raises:
+        BatchReplaceError: The archive already has a batch, complete or
+            interrupted, so it would not add a new one
+    """
+    with SessionLocal() as db:
+        if not crud_ingest.get_batch(db, batch_id):
+            return None
+    archive_hash = hashlib.sha256(zip_content).hexdigest()
+    existing_id, _, completed = load_checkpoint(archive_hash)
+    if completed:
+        raise BatchReplaceError(f"Archive was already ingested as batch {existing_id}")
+    if existing_id is not None:
+        raise BatchReplaceError(f"Archive has an interrupted batch {existing_id}; purge it first")
+
+    try:
+        new_batch_id = process_zip_file(zip_content, writer, source, upsert=False)
+    except Exception:
+        # Queued behind the archive's chunks that may still be waiting for the writer
+        if writer.write(partial(_purge_archive, archive_hash=archive_hash)):
+            refresh_snapshot()
+        raise
+
+    writer.write(partial(crud_ingest.purge_batch, batch_id=batch_id, rebuild=rebuild))
+    refresh_snapshot()
+    return new_batch_id
 
-            for char_data in characters_data:
-                # Validate required fields
-                required_fields = ['character_name', 'affiliation', 'genetic_sequence', 'power_level']
-                if not all(field in char_data for field in required_fields):
-                    continue
-
-                try:
-                    # Create character record
-                    character = crud.create_character(db, {
-                        **char_data,
-                        'gc_content': calculate_gc_content(char_data['genetic_sequence']),
-                        'power_level_group': determine_power_level_group(char_data['power_level'])
-                    })
-                except Exception as e:
-                    logger.exception(f"Error creating character {char_data['character_name']} with error: {e}")
-                    continue
-
-                try:
-                    # Process patterns
-                    patterns = find_repeating_patterns(char_data['genetic_sequence'])
-                    for pattern, count in patterns:
-                        crud.create_pattern(db, character.id, pattern, count)
-                except Exception as e:
-                    logger.exception(f"Error processing patterns for character {char_data['character_name']} with error: {e}")
-                    continue
-
-    db.commit() 
\ No newline at end of file
+def refresh_snapshot() -> None:
+    """Bring the columnar snapshot up to date after data changed, if SNAPSHOT_ENABLED."""
+    if not settings.SNAPSHOT_ENABLED:
+        return
+    # numpy is only imported by processes that keep a snapshot
+    from app.services.snapshot import snapshot_service
+    try:
+        snapshot_service.refresh()
+    except Exception:
+        # The data is committed; a stale snapshot is caught up by the next refresh
+        logger.exception("Failed to refresh the snapshot")
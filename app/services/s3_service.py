@@ -1,14 +1,35 @@
-import boto3
-from botocore.config import Config
+import threading
 from botocore.exceptions import ClientError
 from app.core.config import settings
 from app.utils.logger import logger
 
 class S3Service:
     def __init__(self):
+        self.bucket_name = settings.AWS_S3_BUCKET
+        self._s3_client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def s3_client(self):
+        """The boto3 client, created on first use: importing boto3 and building a client is slow."""
+        if self._s3_client is None:
+            with self._client_lock:
+                if self._s3_client is None:
+                    self._s3_client = self._create_client()
+        return self._s3_client
+
+    def _create_client(self):
+        if settings.AWS_BACKEND == "local":
+            from app.services.local_aws import local_s3
+            logger.info("Using the in-process S3 stand-in")
+            return local_s3
+
+        import boto3
+        from botocore.config import Config
+
         logger.info("Initializing S3 service")
         try:
-            self.s3_client = boto3.client(
+            s3_client = boto3.client(
                 's3',
                 aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
                 aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
@@ -18,8 +39,8 @@ class S3Service:
                     s3={'addressing_style': 'path'}
                 )
             )
-            self.bucket_name = settings.AWS_S3_BUCKET
             logger.info(f"S3 service initialized with bucket: {self.bucket_name}")
+            return s3_client
         except Exception as e:
             logger.exception("Failed to initialize S3 service")
             raise
@@ -0,0 +1,434 @@
+"""
+Columnar on-disk snapshot of the characters and patterns tables, for
+analytics that would otherwise materialize every row through the ORM.
+
+Layout of SNAPSHOT_DIR:
+
+    CURRENT                              name of the live generation directory
+    gen-000001/manifest.json             row counts and refresh state
+    gen-000001/characters.id.npy         one .npy file per numeric column
+    gen-000001/characters.character_name.offsets.npy
+    gen-000001/characters.character_name.data.npy
+    ...
+
+Strings are stored as an int64 offsets column (rows + 1 entries) and a
+uint8 buffer of UTF-8 data. Column files only ever grow: a refresh appends
+the rows ingested since the previous one and then replaces the manifest, so
+a reader slicing each memory-mapped column to the manifest's row counts
+keeps a consistent view while a refresh runs. Updates and deletes (upserts,
+batch purges) cannot be appended; they are detected and rebuild the
+snapshot into a new generation directory.
+"""
+import json
+import os
+import shutil
+import struct
+import threading
+from itertools import chain
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import exists, func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import ReadSessionLocal
+from app.models.character import Character, CharacterPattern, PatternDictionary
+from app.models.ingest import IngestBatch
+from app.utils.logger import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: refreshes are only serialized within the process
+    fcntl = None
+
+FORMAT_VERSION = 1
+
+# Fixed-size .npy header, so the row count can be rewritten in place after an append
+NPY_HEADER_SIZE = 128
+
+# Rows fetched from SQLite per round trip while exporting
+EXPORT_CHUNK_SIZE = 50_000
+
+POWER_LEVEL_GROUPS = ["low", "medium", "high"]
+
+# table -> (numeric columns with their dtypes, string columns)
+TABLES = {
+    "characters": (
+        {
+            "id": np.int64,
+            "affiliation": np.int32,  # index into the manifest's affiliations
+            "power_level": np.int64,
+            "gc_content": np.float64,
+            "power_level_group": np.int8,  # index into POWER_LEVEL_GROUPS, -1 if unknown
+            "batch_id": np.int64,  # -1 if NULL
+        },
+        ["character_name", "genetic_sequence"],
+    ),
+    "character_patterns": ({"character_id": np.int64, "pattern_id": np.int64, "count": np.int64}, []),
+    "patterns": ({"id": np.int64}, ["pattern"]),
+}
+
+def _npy_header(dtype: np.dtype, rows: int) -> bytes:
+    header = repr({"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": (rows,)})
+    # Magic, version 1.0 and the header length take 10 bytes
+    header = header.ljust(NPY_HEADER_SIZE - 10 - 1) + "\n"
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1")
+
+def _append_column(path: Path, rows: int, values: np.ndarray) -> None:
+    """Append values to a column holding `rows` committed rows, dropping anything past them."""
+    if not path.exists():
+        path.write_bytes(_npy_header(values.dtype, 0))
+    with open(path, "r+b") as f:
+        # Rows appended by a refresh that failed before its manifest was written
+        f.truncate(NPY_HEADER_SIZE + rows * values.dtype.itemsize)
+        f.seek(0, os.SEEK_END)
+        f.write(values.tobytes())
+        f.seek(0)
+        f.write(_npy_header(values.dtype, rows + len(values)))
+
+def _encode_strings(values: List[Optional[str]], start: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Offsets (after the first, which is `start`) and UTF-8 data for a list of strings."""
+    encoded = [(value or "").encode("utf-8") for value in values]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    offsets = start + np.cumsum(lengths, dtype=np.int64)
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+class StringColumn:
+    """Offset-encoded strings over memory-mapped buffers, decoded on access."""
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray):
+        self.offsets = offsets
+        # The buffer may extend past the last committed string
+        self.data = data[:offsets[-1]]
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        return self.data[self.offsets[index]:self.offsets[index + 1]].tobytes().decode("utf-8")
+
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def tolist(self, indices: Optional[np.ndarray] = None) -> List[str]:
+        data = self.data.tobytes() if indices is None or len(indices) > len(self) // 4 else None
+        if indices is None:
+            indices = range(len(self))
+        if data is None:
+            return [self[i] for i in indices]
+        offsets = self.offsets.tolist()
+        return [data[offsets[i]:offsets[i + 1]].decode("utf-8") for i in indices]
+
+class Snapshot:
+    """
+    Read-only view of one snapshot state. Columns are memory-mapped, so
+    opening is cheap and aggregations run over the files' pages directly.
+    """
+
+    def __init__(self, directory: Path, manifest: Dict):
+        self.directory = directory
+        self.manifest = manifest
+        self.affiliations: List[str] = manifest["affiliations"]
+        self.columns: Dict[str, Dict[str, np.ndarray]] = {}
+        self.strings: Dict[str, Dict[str, StringColumn]] = {}
+        for table, (numeric, strings) in TABLES.items():
+            rows = manifest["rows"][table]
+            self.columns[table] = {
+                name: np.load(directory / f"{table}.{name}.npy", mmap_mode="r")[:rows] for name in numeric
+            }
+            self.strings[table] = {
+                name: StringColumn(
+                    np.load(directory / f"{table}.{name}.offsets.npy", mmap_mode="r")[:rows + 1],
+                    np.load(directory / f"{table}.{name}.data.npy", mmap_mode="r")
+                )
+                for name in strings
+            }
+        self._pattern_character_rows = None
+
+    @classmethod
+    def open(cls, directory: Optional[str] = None) -> Optional["Snapshot"]:
+        """Open the live snapshot in directory (default SNAPSHOT_DIR), or None if there is none."""
+        root = Path(directory or settings.SNAPSHOT_DIR)
+        # A rebuild may swap generations between reading CURRENT and opening its files
+        for _ in range(3):
+            try:
+                generation = root / (root / "CURRENT").read_text().strip()
+                return cls(generation, json.loads((generation / "manifest.json").read_text()))
+            except FileNotFoundError:
+                if not (root / "CURRENT").exists():
+                    return None
+        raise RuntimeError(f"Could not open snapshot in {root}")
+
+    def __len__(self) -> int:
+        return self.manifest["rows"]["characters"]
+
+    def column(self, name: str, table: str = "characters") -> np.ndarray:
+        return self.columns[table][name]
+
+    def character_mask(self, affiliation: Optional[str] = None) -> Optional[np.ndarray]:
+        """Boolean mask of an affiliation's characters; None means every character."""
+        if affiliation is None:
+            return None
+        if affiliation not in self.affiliations:
+            return np.zeros(len(self), dtype=bool)
+        return self.column("affiliation") == self.affiliations.index(affiliation)
+
+    def pattern_character_rows(self) -> np.ndarray:
+        """Character row of every character pattern row (character ids are sorted, pattern rows are not)."""
+        if self._pattern_character_rows is None:
+            self._pattern_character_rows = np.searchsorted(
+                self.column("id"), self.column("character_id", "character_patterns")
+            )
+        return self._pattern_character_rows
+
+    def gc_content_by_character(self, affiliation: Optional[str] = None) -> Dict[str, float]:
+        mask = self.character_mask(affiliation)
+        rows = np.arange(len(self)) if mask is None else np.flatnonzero(mask)
+        names = self.strings["characters"]["character_name"].tolist(rows)
+        return dict(zip(names, self.column("gc_content")[rows].tolist()))
+
+    def power_level_distribution(self, affiliation: Optional[str] = None) -> Dict[str, int]:
+        groups = self.column("power_level_group")
+        mask = self.character_mask(affiliation)
+        if mask is not None:
+            groups = groups[mask]
+        counts = np.bincount(groups[groups >= 0], minlength=len(POWER_LEVEL_GROUPS))
+        return dict(zip(POWER_LEVEL_GROUPS, counts.tolist()))
+
+    def affiliation_counts(self) -> Dict[str, int]:
+        counts = np.bincount(self.column("affiliation"), minlength=len(self.affiliations))
+        return {affiliation: count for affiliation, count in zip(self.affiliations, counts.tolist()) if count}
+
+    def top_patterns(self, limit: int, affiliation: Optional[str] = None) -> List[Tuple[str, int]]:
+        """Motifs with the highest summed counts, optionally over one affiliation's characters."""
+        pattern_ids = self.column("pattern_id", "character_patterns")
+        counts = self.column("count", "character_patterns")
+        mask = self.character_mask(affiliation)
+        if mask is not None:
+            pattern_mask = mask[self.pattern_character_rows()]
+            pattern_ids, counts = pattern_ids[pattern_mask], counts[pattern_mask]
+        if not len(pattern_ids):
+            return []
+        totals = np.bincount(pattern_ids, weights=counts).astype(np.int64)
+        candidates = np.flatnonzero(totals)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-totals[candidates], limit - 1)[:limit]]
+        # Highest total first, ties by pattern id
+        top = candidates[np.lexsort((candidates, -totals[candidates]))]
+        rows = np.searchsorted(self.column("id", "patterns"), top)
+        return list(zip(self.strings["patterns"]["pattern"].tolist(rows), totals[top].tolist()))
+
+    def chart_columns(self, affiliation: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray, Dict[str, int]]:
+        """Power levels, GC contents and affiliation counts for VisualizationService.get_column_visualizations."""
+        mask = self.character_mask(affiliation)
+        power_levels, gc_contents = self.column("power_level"), self.column("gc_content")
+        if mask is not None:
+            power_levels, gc_contents = power_levels[mask], gc_contents[mask]
+            counts = {affiliation: int(mask.sum())} if mask.any() else {}
+        else:
+            counts = self.affiliation_counts()
+        return power_levels[power_levels >= 0], gc_contents, counts
+
+    def stats(self, affiliation: Optional[str] = None, top_patterns: int = settings.TOP_PATTERNS_COUNT) -> Dict:
+        """Stats in the shape of crud.get_characters_stats / get_affiliation_stats."""
+        return {
+            "gc_content_by_character": self.gc_content_by_character(affiliation),
+            "common_patterns": [{pattern: count} for pattern, count in self.top_patterns(top_patterns, affiliation)],
+            "power_level_distribution": self.power_level_distribution(affiliation)
+        }
+
+class SnapshotService:
+    """Builds and incrementally refreshes the snapshot, and hands out readers."""
+
+    def __init__(self, directory: str = settings.SNAPSHOT_DIR):
+        self.root = Path(directory)
+        self._lock = threading.Lock()
+        self._snapshot: Optional[Snapshot] = None
+        self._snapshot_key = None
+
+    @contextmanager
+    def _exclusive(self):
+        # Serialize refreshes across threads and, where supported, processes
+        with self._lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(self.root / ".lock", "w") as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                yield
+
+    def current(self) -> Optional[Snapshot]:
+        """The live snapshot, reopened when a refresh has replaced it."""
+        try:
+            generation = (self.root / "CURRENT").read_text().strip()
+            key = (generation, os.stat(self.root / generation / "manifest.json").st_mtime_ns)
+        except FileNotFoundError:
+            return None
+        if key != self._snapshot_key:
+            self._snapshot = Snapshot.open(str(self.root))
+            self._snapshot_key = key
+        return self._snapshot
+
+    def _generation(self) -> Tuple[Optional[Path], Optional[Dict]]:
+        try:
+            generation = self.root / (self.root / "CURRENT").read_text().strip()
+            manifest = json.loads((generation / "manifest.json").read_text())
+        except FileNotFoundError:
+            return None, None
+        if manifest.get("version") != FORMAT_VERSION:
+            return None, None
+        return generation, manifest
+
+    def refresh(self, rebuild: bool = False) -> Dict:
+        """
+        Bring the snapshot up to date with the database: append rows added
+        since the last refresh, or rebuild when rows were updated or deleted.
+
+        Args:
+            rebuild: Rebuild from scratch even if an append would do
+
+        Returns:
+            Dict: The new manifest
+        """
+        with self._exclusive(), ReadSessionLocal() as db:
+            # Every query below runs in one read transaction, i.e. one consistent database state
+            generation, manifest = self._generation()
+            if rebuild or manifest is None or self._has_rewrites(db, manifest):
+                return self._rebuild(db, generation)
+            return self._append(db, generation, manifest)
+
+    def _has_rewrites(self, db: Session, manifest: Dict) -> bool:
+        max_id = manifest["max_character_id"]
+        # Deleted characters (purges)
+        if db.scalar(select(func.count()).select_from(Character).where(Character.id <= max_id)) != manifest["rows"]["characters"]:
+            return True
+        # Characters moved to a batch that did not exist yet by an upsert
+        if db.scalar(select(exists().where(Character.id <= max_id, Character.batch_id > manifest["max_batch_id"]))):
+            return True
+        # ... or to a batch that was still being ingested. Rows it appended before the
+        # snapshot was taken are fine, so compare counts rather than look for any row
+        open_batch_rows = db.scalar(
+            select(func.count()).select_from(Character)
+                .where(Character.id <= max_id, Character.batch_id.in_(manifest["open_batch_ids"]))
+        )
+        return open_batch_rows != manifest["open_batch_rows"]
+
+    def _rebuild(self, db: Session, previous: Optional[Path]) -> Dict:
+        number = int(previous.name.split("-")[1]) + 1 if previous else 1
+        generation = self.root / f"gen-{number:06d}"
+        shutil.rmtree(generation, ignore_errors=True)
+        generation.mkdir(parents=True)
+        manifest = {
+            "version": FORMAT_VERSION,
+            "rows": {table: 0 for table in TABLES},
+            "affiliations": [],
+            "max_character_id": 0,
+            "max_pattern_id": 0,
+            "created_at": datetime.utcnow().isoformat(),
+        }
+        # Start every column empty, so tables without rows still open
+        for table, (numeric, strings) in TABLES.items():
+            for name, dtype in numeric.items():
+                _append_column(generation / f"{table}.{name}.npy", 0, np.empty(0, dtype=dtype))
+            for name in strings:
+                _append_column(generation / f"{table}.{name}.offsets.npy", 0, np.zeros(1, dtype=np.int64))
+                _append_column(generation / f"{table}.{name}.data.npy", 0, np.empty(0, dtype=np.uint8))
+        manifest = self._append(db, generation, manifest, rebuilt=True)
+
+        current_tmp = self.root / "CURRENT.tmp"
+        current_tmp.write_text(generation.name)
+        os.replace(current_tmp, self.root / "CURRENT")
+        # Readers that still map old files keep them until they close
+        for old in self.root.glob("gen-*"):
+            if old != generation:
+                shutil.rmtree(old, ignore_errors=True)
+        logger.info(f"Rebuilt snapshot {generation} with {manifest['rows']['characters']} characters")
+        return manifest
+
+    def _append(self, db: Session, generation: Path, manifest: Dict, rebuilt: bool = False) -> Dict:
+        manifest = json.loads(json.dumps(manifest))
+        rows = manifest["rows"]
+        affiliation_codes = {affiliation: code for code, affiliation in enumerate(manifest["affiliations"])}
+        group_codes = {group: code for code, group in enumerate(POWER_LEVEL_GROUPS)}
+        max_character_id = manifest["max_character_id"]
+
+        def append(table: str, columns: Dict[str, np.ndarray], strings: Dict[str, List[str]]) -> None:
+            for name, values in columns.items():
+                _append_column(generation / f"{table}.{name}.npy", rows[table], values)
+            for name, values in strings.items():
+                offsets_path = generation / f"{table}.{name}.offsets.npy"
+                start = int(np.load(offsets_path, mmap_mode="r")[rows[table]])
+                offsets, data = _encode_strings(values, start)
+                _append_column(offsets_path, rows[table] + 1, offsets)
+                _append_column(generation / f"{table}.{name}.data.npy", start, data)
+            rows[table] += len(next(iter(columns.values())))
+
+        # Core rows on the session's connection: the ORM's per-row overhead dominates otherwise
+        connection = db.connection()
+        characters = connection.execute(
+            select(
+                Character.id, Character.character_name, Character.affiliation, Character.genetic_sequence,
+                Character.power_level, Character.gc_content, Character.power_level_group, Character.batch_id
+            ).where(Character.id > max_character_id).order_by(Character.id).execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        )
+        for chunk in characters.partitions():
+            for row in chunk:
+                if row.affiliation not in affiliation_codes:
+                    affiliation_codes[row.affiliation] = len(manifest["affiliations"])
+                    manifest["affiliations"].append(row.affiliation)
+            append("characters", {
+                "id": np.array([row.id for row in chunk], dtype=np.int64),
+                "affiliation": np.array([affiliation_codes[row.affiliation] for row in chunk], dtype=np.int32),
+                "power_level": np.array([-1 if row.power_level is None else row.power_level for row in chunk], dtype=np.int64),
+                "gc_content": np.array([row.gc_content or 0.0 for row in chunk], dtype=np.float64),
+                "power_level_group": np.array([group_codes.get(row.power_level_group, -1) for row in chunk], dtype=np.int8),
+                "batch_id": np.array([-1 if row.batch_id is None else row.batch_id for row in chunk], dtype=np.int64),
+            }, {
+                "character_name": [row.character_name for row in chunk],
+                "genetic_sequence": [row.genetic_sequence for row in chunk],
+            })
+            manifest["max_character_id"] = chunk[-1].id
+
+        character_patterns = connection.execute(
+            # In table order: readers locate the character rows with searchsorted
+            select(CharacterPattern.character_id, CharacterPattern.pattern_id, CharacterPattern.count)
+                .where(CharacterPattern.character_id > max_character_id)
+                .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        )
+        for chunk in character_patterns.partitions():
+            values = np.fromiter(chain.from_iterable(chunk), dtype=np.int64, count=3 * len(chunk)).reshape(-1, 3)
+            append("character_patterns", {
+                "character_id": values[:, 0].copy(),
+                "pattern_id": values[:, 1].copy(),
+                "count": values[:, 2].copy(),
+            }, {})
+
+        patterns = connection.execute(
+            select(PatternDictionary.id, PatternDictionary.pattern)
+                .where(PatternDictionary.id > manifest["max_pattern_id"])
+                .order_by(PatternDictionary.id)
+                .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        )
+        for chunk in patterns.partitions():
+            append("patterns", {"id": np.array([row.id for row in chunk], dtype=np.int64)}, {
+                "pattern": [row.pattern for row in chunk]
+            })
+            manifest["max_pattern_id"] = chunk[-1].id
+
+        manifest["max_batch_id"] = db.scalar(select(func.max(IngestBatch.id))) or 0
+        manifest["open_batch_ids"] = db.scalars(select(IngestBatch.id).where(IngestBatch.completed.is_(False))).all()
+        batch_ids = np.load(generation / "characters.batch_id.npy", mmap_mode="r")[:rows["characters"]]
+        manifest["open_batch_rows"] = int(np.isin(batch_ids, manifest["open_batch_ids"]).sum())
+        manifest["refreshed_at"] = datetime.utcnow().isoformat()
+
+        manifest_tmp = generation / "manifest.json.tmp"
+        manifest_tmp.write_text(json.dumps(manifest))
+        os.replace(manifest_tmp, generation / "manifest.json")
+        if not rebuilt:
+            logger.info(f"Refreshed snapshot {generation}: {manifest['rows']['characters']} characters")
+        return manifest
+
+snapshot_service = SnapshotService()
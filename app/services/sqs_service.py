@@ -1,78 +1,246 @@
-import boto3
 import json
-from typing import Optional, Dict, Any
-from sqlalchemy.orm import Session
+import queue
+import threading
+import time
+from typing import Optional, Dict, Any, Callable, List, Tuple
 from app.core.config import settings
+from app.db.writer import db_writer
 from app.services.processing import process_zip_file
 from app.services.s3_service import s3_service
-from app.db.session import SessionLocal
 from app.utils.logger import logger
+from app.utils.metrics import (
+    INGEST_STAGE_SECONDS, SQS_MESSAGES, SQS_PREFETCHED_ARCHIVES, SQS_PREFETCHED_BYTES, SQS_QUEUE_DEPTH
+)
 
 class SQSService:
     def __init__(self):
-        self.sqs_client = boto3.client(
-            'sqs',
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            region_name=settings.AWS_REGION
-        )
         self.queue_url = settings.AWS_SQS_QUEUE_URL
+        self._queue_depth_checked_at = 0.0
+        self._sqs_client = None
+        self._client_lock = threading.Lock()
+        # Replaced by a RemoteWriter in app.worker consumers
+        self.writer = db_writer
+
+    @property
+    def sqs_client(self):
+        """The boto3 client, created on first use like S3Service.s3_client."""
+        if self._sqs_client is None:
+            with self._client_lock:
+                if self._sqs_client is None and settings.AWS_BACKEND == "local":
+                    from app.services.local_aws import local_sqs
+                    self._sqs_client = local_sqs
+                elif self._sqs_client is None:
+                    import boto3
+                    self._sqs_client = boto3.client(
+                        'sqs',
+                        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                        region_name=settings.AWS_REGION
+                    )
+        return self._sqs_client
+
+    def update_queue_depth(self):
+        """Refresh the SQS backlog gauges, at most once per SQS_QUEUE_DEPTH_INTERVAL seconds."""
+        now = time.monotonic()
+        if now - self._queue_depth_checked_at < settings.SQS_QUEUE_DEPTH_INTERVAL:
+            return
+        self._queue_depth_checked_at = now
+        try:
+            attributes = self.sqs_client.get_queue_attributes(
+                QueueUrl=self.queue_url,
+                AttributeNames=['ApproximateNumberOfMessages', 'ApproximateNumberOfMessagesNotVisible']
+            )['Attributes']
+            SQS_QUEUE_DEPTH.set(int(attributes['ApproximateNumberOfMessages']), "visible")
+            SQS_QUEUE_DEPTH.set(int(attributes['ApproximateNumberOfMessagesNotVisible']), "not_visible")
+        except Exception as e:
+            logger.warning(f"Failed to read SQS queue depth: {e}")
+
+    def _receive(self) -> List[Dict[str, Any]]:
+        self.update_queue_depth()
+        response = self.sqs_client.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=1,
+            WaitTimeSeconds=settings.SQS_WAIT_TIME_SECONDS
+        )
+        return response.get('Messages', [])
+
+    @staticmethod
+    def _s3_object(message: Dict[str, Any]) -> Dict[str, Any]:
+        """The S3 event's object (key and size) carried by a message."""
+        body = json.loads(message['Body'])
+        return body.get('Records', [{}])[0].get('s3', {}).get('object', {})
+
+    def _download(self, s3_key: str) -> Optional[bytes]:
+        with INGEST_STAGE_SECONDS.time("download"):
+            return s3_service.get_object(s3_key)
+
+    def _ingest(self, message: Dict[str, Any], s3_key: str, file_content: bytes) -> None:
+        """Process a downloaded archive, then delete its message and S3 object."""
+        process_zip_file(file_content, self.writer, source=s3_key)
+
+        # Delete the processed message from SQS
+        self.sqs_client.delete_message(
+            QueueUrl=self.queue_url,
+            ReceiptHandle=message['ReceiptHandle']
+        )
+
+        SQS_MESSAGES.inc("processed")
+
+        # Delete the processed file from S3
+        if s3_service.delete_object(s3_key):
+            logger.info(f"Successfully processed and cleaned up file: {s3_key}")
+        else:
+            logger.warning(f"File processed but failed to delete from S3: {s3_key}")
 
-    def process_messages(self):
+    def process_messages(self, stop: Optional[threading.Event] = None, heartbeat: Optional[Callable[[str], None]] = None):
         """
         Poll the SQS queue and process messages.
-        Creates a new database session for each message to avoid locks.
+        Database writes go through self.writer.
+
+        With SQS_PREFETCH_ARCHIVES > 0, receiving and downloading run ahead
+        of processing on a separate thread (see _process_pipelined).
+
+        Args:
+            stop: Return once this is set, after finishing the message in hand
+                (within SQS_WAIT_TIME_SECONDS when idle)
+            heartbeat: Called after every poll with "poll", and after every message
+                with its outcome ("processed", "failed" or "skipped")
         """
-        while True:
+        def outcome(status: str) -> None:
+            if status != "processed":
+                SQS_MESSAGES.inc(status)
+            if heartbeat:
+                heartbeat(status)
+
+        if settings.SQS_PREFETCH_ARCHIVES > 0:
+            return self._process_pipelined(stop, heartbeat, outcome)
+
+        while stop is None or not stop.is_set():
             try:
                 # Receive messages from the queue
-                response = self.sqs_client.receive_message(
-                    QueueUrl=self.queue_url,
-                    MaxNumberOfMessages=1,
-                    WaitTimeSeconds=20
-                )
+                messages = self._receive()
+                if heartbeat:
+                    heartbeat("poll")
 
-                messages = response.get('Messages', [])
                 for message in messages:
-                    # Create a new database session for each message
-                    db = SessionLocal()
                     try:
-                        # Parse the message body
-                        body = json.loads(message['Body'])
-                        
                         # Get the S3 object key from the message
-                        s3_key = body.get('Records', [{}])[0].get('s3', {}).get('object', {}).get('key')
+                        s3_key = self._s3_object(message).get('key')
                         if not s3_key:
+                            outcome("skipped")
                             continue
 
                         # Get the file from S3
-                        file_content = s3_service.get_object(s3_key)
+                        file_content = self._download(s3_key)
                         if not file_content:
+                            outcome("failed")
                             continue
 
-                        # Process the ZIP file
-                        process_zip_file(file_content, db)
-
-                        # Delete the processed message from SQS
-                        self.sqs_client.delete_message(
-                            QueueUrl=self.queue_url,
-                            ReceiptHandle=message['ReceiptHandle']
-                        )
-
-                        # Delete the processed file from S3
-                        if s3_service.delete_object(s3_key):
-                            logger.info(f"Successfully processed and cleaned up file: {s3_key}")
-                        else:
-                            logger.warning(f"File processed but failed to delete from S3: {s3_key}")
+                        self._ingest(message, s3_key, file_content)
+                        outcome("processed")
 
                     except Exception as e:
+                        outcome("failed")
                         logger.exception(f"Error processing message: {e}")
-                    finally:
-                        # Always close the database session
-                        db.close()
 
             except Exception as e:
                 logger.exception(f"Error polling queue: {e}")
                 continue
 
+    def _process_pipelined(self, stop, heartbeat, outcome) -> None:
+        """
+        Receive and download up to SQS_PREFETCH_ARCHIVES archives ahead on a
+        prefetch thread while this thread processes, so network and CPU time
+        overlap instead of adding up. Downloaded archives held in memory are
+        capped at SQS_PREFETCH_BYTES (sized from the S3 event when it has the
+        object size); a single larger archive is still let through alone.
+
+        Prefetched messages are invisible to other consumers while they wait,
+        so keep the prefetch depth well within the queue's visibility timeout.
+        On stop, prefetched messages that were not started are made visible
+        again for other consumers.
+        """
+        buffer: "queue.Queue[Optional[Tuple]]" = queue.Queue(maxsize=settings.SQS_PREFETCH_ARCHIVES)
+        budget = _ByteBudget(settings.SQS_PREFETCH_BYTES)
+
+        def prefetch() -> None:
+            try:
+                while stop is None or not stop.is_set():
+                    try:
+                        messages = self._receive()
+                        if heartbeat:
+                            heartbeat("poll")
+                        for message in messages:
+                            try:
+                                s3_object = self._s3_object(message)
+                                s3_key = s3_object.get('key')
+                                if not s3_key:
+                                    outcome("skipped")
+                                    continue
+                                reserved = int(s3_object.get('size') or 0)
+                                budget.acquire(reserved)
+                                file_content = self._download(s3_key)
+                                if not file_content:
+                                    budget.release(reserved)
+                                    outcome("failed")
+                                    continue
+                                # The event's size is missing or stale: account for what was downloaded
+                                budget.acquire(len(file_content) - reserved, wait=False)
+                                buffer.put((message, s3_key, file_content))
+                                SQS_PREFETCHED_ARCHIVES.set(buffer.qsize())
+                            except Exception as e:
+                                outcome("failed")
+                                logger.exception(f"Error prefetching message: {e}")
+                    except Exception as e:
+                        logger.exception(f"Error polling queue: {e}")
+            finally:
+                buffer.put(None)
+
+        prefetcher = threading.Thread(target=prefetch, name="sqs-prefetch", daemon=True)
+        prefetcher.start()
+        while True:
+            item = buffer.get()
+            SQS_PREFETCHED_ARCHIVES.set(buffer.qsize())
+            if item is None:
+                break
+            message, s3_key, file_content = item
+            try:
+                if stop is not None and stop.is_set():
+                    # Draining: hand prefetched messages back rather than process them
+                    self.sqs_client.change_message_visibility(
+                        QueueUrl=self.queue_url, ReceiptHandle=message['ReceiptHandle'], VisibilityTimeout=0
+                    )
+                    logger.info(f"Released prefetched message for {s3_key}")
+                    continue
+                self._ingest(message, s3_key, file_content)
+                outcome("processed")
+            except Exception as e:
+                outcome("failed")
+                logger.exception(f"Error processing message: {e}")
+            finally:
+                budget.release(len(file_content))
+        prefetcher.join()
+
+class _ByteBudget:
+    """Bytes of downloaded archives waiting in memory, bounded by limit."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, size: int, wait: bool = True) -> None:
+        with self._condition:
+            # Anything fits into an empty budget, so an oversized archive cannot block forever
+            while wait and self.used and self.used + size > self.limit:
+                self._condition.wait()
+            self.used += size
+            SQS_PREFETCHED_BYTES.set(self.used)
+
+    def release(self, size: int) -> None:
+        with self._condition:
+            self.used -= size
+            SQS_PREFETCHED_BYTES.set(self.used)
+            self._condition.notify_all()
+
 sqs_service = SQSService() 
\ No newline at end of file
@@ -1,70 +1,120 @@
 import os
-import matplotlib
-matplotlib.use('Agg')  # Set the backend to non-interactive Agg
-import matplotlib.pyplot as plt
-import seaborn as sns
-from typing import List, Dict
+import threading
+from typing import Dict, List, Sequence
 from sqlalchemy.orm import Session
 from app.models.character import Character
 from app.utils.logger import logger
 
+_plotting_modules = None
+_plotting_lock = threading.Lock()
+
+def _plotting():
+    """
+    Import pyplot and seaborn on first use; together they take most of a
+    second to import, which every process would otherwise pay at startup.
+
+    Returns:
+        Tuple: The matplotlib.pyplot and seaborn modules
+    """
+    global _plotting_modules
+    with _plotting_lock:
+        if _plotting_modules is None:
+            import matplotlib
+            matplotlib.use('Agg')  # Set the backend to non-interactive Agg
+            import matplotlib.pyplot as plt
+            import seaborn as sns
+            _plotting_modules = (plt, sns)
+    return _plotting_modules
+
 class VisualizationService:
     def __init__(self):
         self.static_dir = "app/static/graphs"
-        os.makedirs(self.static_dir, exist_ok=True)
 
-    def generate_power_level_distribution(self, characters: List[Character]) -> str:
-        """Generate and save power level distribution graph."""
-        plt.figure(figsize=(10, 6))
-        sns.histplot(data=[c.power_level for c in characters], bins=20)
-        plt.title("Power Level Distribution")
-        plt.xlabel("Power Level")
-        plt.ylabel("Count")
-        
-        filename = "power_level_distribution.png"
-        filepath = os.path.join(self.static_dir, filename)
-        plt.savefig(filepath)
+    def _save(self, filename: str) -> str:
+        plt, _ = _plotting()
+        plt.savefig(os.path.join(self.static_dir, filename))
         plt.close()
-        
         return f"/static/graphs/{filename}"
 
-    def generate_gc_content_distribution(self, characters: List[Character]) -> str:
-        """Generate and save GC content distribution graph."""
+    def _histogram(self, values: Sequence[float], title: str, xlabel: str, filename: str) -> str:
+        plt, sns = _plotting()
         plt.figure(figsize=(10, 6))
-        sns.histplot(data=[c.gc_content for c in characters], bins=20)
-        plt.title("GC Content Distribution")
-        plt.xlabel("GC Content (%)")
+        sns.histplot(data=values, bins=20)
+        plt.title(title)
+        plt.xlabel(xlabel)
         plt.ylabel("Count")
-        
-        filename = "gc_content_distribution.png"
-        filepath = os.path.join(self.static_dir, filename)
-        plt.savefig(filepath)
-        plt.close()
-        
-        return f"/static/graphs/{filename}"
+        return self._save(filename)
 
-    def generate_affiliation_pie_chart(self, characters: List[Character]) -> str:
-        """Generate and save affiliation distribution pie chart."""
+    def _pie(self, affiliation_counts: Dict[str, int], filename: str) -> str:
+        plt, _ = _plotting()
         plt.figure(figsize=(10, 6))
+        plt.pie(affiliation_counts.values(), labels=affiliation_counts.keys(), autopct='%1.1f%%')
+        plt.title("Character Affiliation Distribution")
+        return self._save(filename)
+
+    def generate_power_level_distribution(self, characters: List[Character], prefix: str = "") -> str:
+        """Generate and save power level distribution graph."""
+        return self._histogram(
+            [c.power_level for c in characters], "Power Level Distribution", "Power Level",
+            f"{prefix}power_level_distribution.png"
+        )
+
+    def generate_gc_content_distribution(self, characters: List[Character], prefix: str = "") -> str:
+        """Generate and save GC content distribution graph."""
+        return self._histogram(
+            [c.gc_content for c in characters], "GC Content Distribution", "GC Content (%)",
+            f"{prefix}gc_content_distribution.png"
+        )
+
+    def generate_affiliation_pie_chart(self, characters: List[Character], prefix: str = "") -> str:
+        """Generate and save affiliation distribution pie chart."""
         affiliation_counts = {}
         for char in characters:
             affiliation_counts[char.affiliation] = affiliation_counts.get(char.affiliation, 0) + 1
-        
-        plt.pie(affiliation_counts.values(), labels=affiliation_counts.keys(), autopct='%1.1f%%')
-        plt.title("Character Affiliation Distribution")
-        
-        filename = "affiliation_distribution.png"
-        filepath = os.path.join(self.static_dir, filename)
-        plt.savefig(filepath)
-        plt.close()
-        
-        return f"/static/graphs/{filename}"
+        return self._pie(affiliation_counts, f"{prefix}affiliation_distribution.png")
     
-    def get_visualizations(self, characters: List[Character]) -> Dict[str, str]:
+    def get_visualizations(self, characters: List[Character], prefix: str = "") -> Dict[str, str]:
+        """
+        Render the charts for a set of characters. Anything with character_name,
+        affiliation, power_level and gc_content attributes works as a character.
+
+        Args:
+            characters: The characters to chart
+            prefix: Prepended to the file names, so charts for different subsets do not overwrite each other
+        """
+        os.makedirs(self.static_dir, exist_ok=True)
+        return {
+            "power_level_distribution": self.generate_power_level_distribution(characters, prefix),
+            "gc_content_distribution": self.generate_gc_content_distribution(characters, prefix),
+            "affiliation_distribution": self.generate_affiliation_pie_chart(characters, prefix)
+        }
+
+    def get_column_visualizations(
+        self,
+        power_levels: Sequence[float],
+        gc_contents: Sequence[float],
+        affiliation_counts: Dict[str, int],
+        prefix: str = ""
+    ) -> Dict[str, str]:
+        """
+        Render the same charts as get_visualizations from column arrays (e.g.
+        snapshot columns), without building a character object per row.
+
+        Args:
+            power_levels: Power level of every character
+            gc_contents: GC content of every character
+            affiliation_counts: Number of characters per affiliation
+            prefix: Prepended to the file names
+        """
+        os.makedirs(self.static_dir, exist_ok=True)
         return {
-            "power_level_distribution": self.generate_power_level_distribution(characters),
-            "gc_content_distribution": self.generate_gc_content_distribution(characters),
-            "affiliation_distribution": self.generate_affiliation_pie_chart(characters)
+            "power_level_distribution": self._histogram(
+                power_levels, "Power Level Distribution", "Power Level", f"{prefix}power_level_distribution.png"
+            ),
+            "gc_content_distribution": self._histogram(
+                gc_contents, "GC Content Distribution", "GC Content (%)", f"{prefix}gc_content_distribution.png"
+            ),
+            "affiliation_distribution": self._pie(affiliation_counts, f"{prefix}affiliation_distribution.png")
         }
 
 visualization_service = VisualizationService() 
\ No newline at end of file
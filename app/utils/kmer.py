@@ -0,0 +1,28 @@
+from typing import Optional
+
+# Motifs up to this length are packed into a single signed 64-bit integer:
+# a leading sentinel bit followed by two bits per base.
+MAX_ENCODED_LENGTH = 31
+
+BASE_TO_BITS = {'A': 0, 'C': 1, 'G': 2, 'T': 3}
+BITS_TO_BASE = 'ACGT'
+
+def encode_kmer(kmer: str) -> Optional[int]:
+    """Encode a short A/C/G/T motif as a 2-bit packed integer, or None if it cannot be encoded."""
+    if not kmer or len(kmer) > MAX_ENCODED_LENGTH:
+        return None
+    code = 1
+    for base in kmer.upper():
+        bits = BASE_TO_BITS.get(base)
+        if bits is None:
+            return None
+        code = (code << 2) | bits
+    return code
+
+def decode_kmer(code: int) -> str:
+    """Decode an integer produced by encode_kmer back into its motif."""
+    bases = []
+    while code > 1:
+        bases.append(BITS_TO_BASE[code & 3])
+        code >>= 2
+    return ''.join(reversed(bases))
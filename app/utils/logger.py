@@ -1,29 +1,112 @@
+import atexit
+import copy
+import json
 import logging
+import queue
 import sys
+import threading
+import time
+from datetime import datetime, timezone
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from app.core.config import settings
+from app.utils.metrics import LOG_RECORDS_DROPPED
 
 # Create logs directory if it doesn't exist
 log_dir = Path("logs")
 log_dir.mkdir(exist_ok=True)
 
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "file": record.filename,
+            "line": record.lineno,
+            "thread": record.threadName,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry)
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler for a bounded queue: when the queue is full the record is
+    dropped and counted instead of blocking the logging thread.
+    """
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge args now (they may change once we return) but keep the
+        # traceback separate so each handler's formatter can lay it out
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class RateLimitFilter(logging.Filter):
+    """
+    Let through at most `burst` records per call site every `window` seconds.
+    The first record after a window with suppressed records reports how many
+    were dropped.
+    """
+
+    def __init__(self, burst: int, window: float):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        site = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            window_start, emitted, suppressed = self._sites.get(site, (now, 0, 0))
+            if now - window_start >= self.window:
+                window_start, emitted = now, 0
+            if emitted >= self.burst:
+                self._sites[site] = (window_start, emitted, suppressed + 1)
+                return False
+            self._sites[site] = (window_start, emitted + 1, 0)
+        if suppressed:
+            record.msg = f"{record.msg} (suppressed {suppressed} similar messages)"
+        return True
+
 # Configure the logger
 logger = logging.getLogger("marvel_genetics")
 logger.setLevel(settings.LOG_LEVEL)
 
 # Create formatters
-console_formatter = logging.Formatter(
-    '%(levelname)s:     %(message)s'
-)
-file_formatter = logging.Formatter(
-    '%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'
-)
+if settings.LOG_JSON:
+    console_formatter = file_formatter = JsonFormatter()
+else:
+    console_formatter = logging.Formatter(
+        '%(levelname)s:     %(message)s'
+    )
+    file_formatter = logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'
+    )
 
 # Console handler
 console_handler = logging.StreamHandler(sys.stdout)
 console_handler.setFormatter(console_formatter)
-logger.addHandler(console_handler)
+# uvicorn prints its own records to the console; we only add them to the file
+console_handler.addFilter(lambda record: not record.name.startswith("uvicorn"))
 
 # File handler with rotation
 file_handler = RotatingFileHandler(
@@ -32,7 +115,25 @@ file_handler = RotatingFileHandler(
     backupCount=5
 )
 file_handler.setFormatter(file_formatter)
-logger.addHandler(file_handler)
+
+# Callers only enqueue; formatting, console/file I/O and rotation happen on the listener thread
+log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+queue_handler = DroppingQueueHandler(log_queue)
+logger.addHandler(queue_handler)
+
+log_listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+log_listener.start()
+
+def stop_logging() -> None:
+    """Flush queued records and stop the listener thread. Safe to call more than once."""
+    if log_listener._thread is not None:
+        log_listener.stop()
+
+atexit.register(stop_logging)
 
 # Prevent propagation to root logger
 logger.propagate = False
+
+# For errors that can repeat once per record (e.g. per character of an archive)
+record_logger = logging.getLogger("marvel_genetics.records")
+record_logger.addFilter(RateLimitFilter(settings.LOG_RATE_LIMIT_BURST, settings.LOG_RATE_LIMIT_WINDOW_SECONDS))
@@ -0,0 +1,202 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Seconds; spans per-character analysis (sub-millisecond) up to whole archives
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0)
+
+def _format_labels(label_names: Sequence[str], label_values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Metric:
+    """Base class for a metric family with optional labels."""
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Tuple[str, ...]) -> Tuple[str, ...]:
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {labels}")
+        return tuple(str(label) for label in labels)
+
+    def render(self, values: Optional[Dict[Tuple[str, ...], object]] = None) -> List[str]:
+        """Render this metric, or the given values of it (see Registry.combine)."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        if values is None:
+            with self._lock:
+                values = dict(self._values)
+        for labels, value in values.items():
+            lines.extend(self._render_value(labels, value))
+        return lines
+
+    def snapshot(self) -> Dict[Tuple[str, ...], object]:
+        """A copy of the values, safe to pickle and send to another process."""
+        with self._lock:
+            return {labels: self._add(None, value) for labels, value in self._values.items()}
+
+    def _add(self, total, value):
+        """Sum of two values of this metric from different processes; total may be None."""
+        return value if total is None else total + value
+
+    def _render_value(self, labels: Tuple[str, ...], value) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {value}"]
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    type_name = "gauge"
+
+    def set(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, *labels: str) -> "Timer":
+        """Context manager observing the time spent in its block."""
+        return Timer(self, labels)
+
+    def _add(self, total, value):
+        if total is None:
+            return [list(value[0]), value[1], value[2]]
+        return [[a + b for a, b in zip(total[0], value[0])], total[1] + value[1], total[2] + value[2]]
+
+    def _render_value(self, labels: Tuple[str, ...], value) -> List[str]:
+        bucket_counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+            cumulative += bucket_count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            le_label = f'le="{le}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le_label)} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {total}")
+        lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {count}")
+        return lines
+
+class Timer:
+    # A plain class rather than @contextmanager: this wraps per-character work
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self, snapshot: Optional[Dict[str, Dict]] = None) -> str:
+        """Render all metrics in the Prometheus text exposition format, or the values of a snapshot."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(None if snapshot is None else snapshot.get(metric.name, {})))
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Every metric's values, by metric name, for aggregation in another process."""
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+    def combine(self, snapshots: Sequence[Dict[str, Dict]], gauges: bool = True) -> Dict[str, Dict]:
+        """
+        Sum snapshots taken in several processes of this registry's metrics.
+        Without gauges, only what accumulates (counters and histograms) is kept.
+        """
+        combined = {}
+        for metric in self._metrics:
+            if isinstance(metric, Gauge) and not gauges:
+                continue
+            values = {}
+            for snapshot in snapshots:
+                for labels, value in snapshot.get(metric.name, {}).items():
+                    values[labels] = metric._add(values.get(labels), value)
+            combined[metric.name] = values
+        return combined
+
+registry = Registry()
+
+# Ingest pipeline
+INGEST_STAGE_SECONDS = registry.register(Histogram(
+    "ingest_stage_seconds",
+    "Time spent per ingest stage (download, unzip, sniff, parse, gc, patterns, spectrum, flush, write, commit)",
+    ["stage"]
+))
+INGEST_ARCHIVES = registry.register(Counter("ingest_archives_total", "Archives processed, by outcome", ["status"]))
+INGEST_MEMBERS = registry.register(Counter("ingest_members_total", "Data files read from archives"))
+INGEST_CHARACTERS = registry.register(Counter("ingest_characters_total", "Characters analyzed and queued for writing"))
+INGEST_PATTERNS = registry.register(Counter("ingest_patterns_total", "Pattern rows found in analyzed characters"))
+INGEST_BYTES = registry.register(Counter("ingest_bytes_total", "Archive bytes processed"))
+INGEST_UPSERTS = registry.register(Counter(
+    "ingest_upserted_characters_total", "Characters written in upsert mode, by outcome", ["result"]
+))
+
+# Database writer
+DB_WRITE_QUEUE_DEPTH = registry.register(Gauge("db_write_queue_depth", "Batches waiting for the database writer"))
+DB_GROUP_COMMIT_BATCHES = registry.register(Histogram(
+    "db_group_commit_batches", "Batches committed per group commit", buckets=(1, 2, 4, 8, 16, 32, 64)
+))
+
+# SQS consumer
+SQS_MESSAGES = registry.register(Counter("sqs_messages_total", "SQS messages handled, by outcome", ["status"]))
+SQS_QUEUE_DEPTH = registry.register(Gauge(
+    "sqs_queue_depth", "Approximate SQS backlog (visible = waiting, not_visible = in flight)", ["state"]
+))
+SQS_PREFETCHED_ARCHIVES = registry.register(Gauge(
+    "sqs_prefetched_archives", "Archives downloaded ahead and waiting to be processed"
+))
+SQS_PREFETCHED_BYTES = registry.register(Gauge("sqs_prefetched_bytes", "Bytes of archives downloaded ahead"))
+
+# app.worker supervisor
+WORKER_PROCESSES_ALIVE = registry.register(Gauge(
+    "worker_processes_alive", "Supervised app.worker processes running, by role (consumer, writer)", ["role"]
+))
+WORKER_RESTARTS = registry.register(Counter(
+    "worker_restarts_total", "Supervised app.worker processes restarted, by role (consumer, writer)", ["role"]
+))
+
+# Logging
+LOG_RECORDS_DROPPED = registry.register(Counter("log_records_dropped_total", "Log records dropped because the log queue was full"))
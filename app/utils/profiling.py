@@ -0,0 +1,149 @@
+import contextvars
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.security import is_superuser_token
+from app.utils.logger import logger
+
+# Set while a request is being profiled. Starlette copies the current context
+# into threadpool calls, so sync endpoints and dependencies inherit it too.
+_active_profiler: contextvars.ContextVar[Optional["SamplingProfiler"]] = contextvars.ContextVar(
+    "active_profiler", default=None
+)
+
+# anyio worker threads run jobs via `context.run(...)` in WorkerThread.run,
+# asyncio runs callbacks via `self._context.run(...)` in Handle._run
+_CONTEXT_RUNNERS = {"run", "_run"}
+
+def _frame_context(frame) -> Optional[contextvars.Context]:
+    """The contextvars.Context a frame is running code in, if it holds one."""
+    if frame.f_code.co_name not in _CONTEXT_RUNNERS:
+        return None
+    try:
+        f_locals = frame.f_locals
+        context = f_locals.get("context")
+        if not isinstance(context, contextvars.Context):
+            context = getattr(f_locals.get("self"), "_context", None)
+    except Exception:
+        return None
+    return context if isinstance(context, contextvars.Context) else None
+
+class SamplingProfiler:
+    """
+    Statistical profiler for a single request.
+
+    A background thread samples every thread's stack at a fixed interval and
+    keeps the stacks that are running inside this request's context, whether
+    on the event loop or in a threadpool worker. Samples are kept as folded
+    stacks ("outer;inner count"), the input format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval: float = settings.PROFILING_INTERVAL_MS / 1000):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._token = None
+
+    def __enter__(self) -> "SamplingProfiler":
+        self._token = _active_profiler.set(self)
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+        _active_profiler.reset(self._token)
+
+    def _run(self) -> None:
+        own_thread = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                stack = self._request_stack(frame)
+                if stack:
+                    self.samples[";".join(stack)] += 1
+
+    def _request_stack(self, frame) -> Optional[List[str]]:
+        stack = []
+        in_request = False
+        while frame is not None:
+            stack.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+            if not in_request:
+                context = _frame_context(frame)
+                in_request = context is not None and context.get(_active_profiler) is self
+            frame = frame.f_back
+        if not in_request:
+            return None
+        stack.reverse()
+        return stack
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+def write_profile(profiler: SamplingProfiler, method: str, path: str, duration_ms: float) -> Path:
+    """Write a profile to PROFILING_DIR, keeping at most PROFILING_MAX_FILES profiles."""
+    directory = Path(settings.PROFILING_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root"
+    filename = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}_{method}_{slug}_{duration_ms:.0f}ms.folded"
+    profile_path = directory / filename
+    profile_path.write_text(profiler.folded())
+
+    profiles = sorted(directory.glob("*.folded"), key=lambda p: p.stat().st_mtime)
+    for old_profile in profiles[:-settings.PROFILING_MAX_FILES]:
+        old_profile.unlink(missing_ok=True)
+    return profile_path
+
+class ProfilingMiddleware:
+    """
+    Profile a random PROFILING_SAMPLE_RATE share of requests, plus any request
+    sending the PROFILING_HEADER header with a superuser's bearer token.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.header = settings.PROFILING_HEADER.lower().encode()
+
+    async def _should_profile(self, scope: Scope) -> bool:
+        if settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE:
+            return True
+        headers = dict(scope["headers"])
+        if self.header not in headers:
+            return False
+        authorization = headers.get(b"authorization", b"").decode()
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return False
+        return await run_in_threadpool(is_superuser_token, token)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not await self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        with SamplingProfiler() as profiler:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                duration_ms = (time.perf_counter() - start) * 1000
+        try:
+            profile_path = await run_in_threadpool(write_profile, profiler, scope["method"], scope["path"], duration_ms)
+            logger.info(f"Profiled {scope['method']} {scope['path']} ({duration_ms:.0f} ms): {profile_path}")
+        except Exception as e:
+            logger.exception(f"Failed to write profile for {scope['path']}: {e}")
@@ -0,0 +1,109 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.utils.kmer import BITS_TO_BASE
+
+# Dense affiliation sums hold 4**k int64 counts: 512 KB per affiliation at k=8
+MAX_K = 8
+
+# Byte -> 2-bit base code, 4 for anything that is not A/C/G/T
+_BASE_CODES = np.full(256, 4, dtype=np.uint8)
+for _code, _base in enumerate(b"ACGT"):
+    _BASE_CODES[_base] = _BASE_CODES[_base + 32] = _code
+
+def check_k(k: int) -> None:
+    if not 1 <= k <= MAX_K:
+        raise ValueError(f"k-mer length must be between 1 and {MAX_K}, got {k}")
+
+def kmer_spectrum(sequence: str, k: int) -> np.ndarray:
+    """
+    Count every k-mer of a sequence. Index i holds the k-mer whose bases,
+    as 2-bit A/C/G/T codes, spell i (the encode_kmer order without its
+    sentinel bit). Windows with other characters are not counted.
+    """
+    check_k(k)
+    codes = _BASE_CODES[np.frombuffer(sequence.encode("ascii", errors="replace"), dtype=np.uint8)]
+    windows = len(codes) - k + 1
+    if windows <= 0:
+        return np.zeros(4 ** k, dtype=np.int64)
+    invalid = np.concatenate(([0], np.cumsum(codes == 4)))
+    valid = invalid[k:] == invalid[:-k]
+    index = np.zeros(windows, dtype=np.int64)
+    for offset in range(k):
+        index = (index << 2) | (codes[offset:offset + windows] & 3)
+    return np.bincount(index[valid], minlength=4 ** k)
+
+def encode_spectrum(counts: np.ndarray) -> bytes:
+    """
+    Pack a character's spectrum: dense uint32 counts, or uint32 indices then
+    counts of the non-zero entries when that is strictly smaller. Short
+    sequences only contain a few of the 4**k k-mers.
+    """
+    nonzero = np.flatnonzero(counts)
+    if len(nonzero) * 8 < len(counts) * 4:
+        return nonzero.astype("<u4").tobytes() + counts[nonzero].astype("<u4").tobytes()
+    return counts.astype("<u4").tobytes()
+
+def decode_spectrum(blob: bytes, k: int) -> np.ndarray:
+    size = 4 ** k
+    values = np.frombuffer(blob, dtype="<u4")
+    if len(values) == size:
+        return values.astype(np.int64)
+    nonzero = len(values) // 2
+    counts = np.zeros(size, dtype=np.int64)
+    counts[values[:nonzero]] = values[nonzero:]
+    return counts
+
+def encode_totals(counts: np.ndarray) -> bytes:
+    """Dense int64 encoding for summed (affiliation) spectra."""
+    return counts.astype("<i8").tobytes()
+
+def decode_totals(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype="<i8").astype(np.int64)
+
+def kmer_label(index: int, k: int) -> str:
+    return "".join(BITS_TO_BASE[(index >> (2 * (k - 1 - offset))) & 3] for offset in range(k))
+
+def spectrum_counts(counts: np.ndarray, k: int) -> Dict[str, int]:
+    """Non-zero counts by k-mer, in k-mer order."""
+    nonzero = np.flatnonzero(counts)
+    return dict(zip((kmer_label(i, k) for i in nonzero.tolist()), counts[nonzero].tolist()))
+
+def enrichment(counts_a: np.ndarray, counts_b: np.ndarray, k: int, top: int) -> Tuple[List[Dict], List[Dict]]:
+    """
+    k-mers most over-represented in a relative to b, and in b relative to a.
+
+    Frequencies get a pseudocount of one per k-mer, so k-mers absent from
+    one side still have a finite log2 fold change.
+
+    Returns:
+        Tuple: The top k-mers enriched in a and in b, by log2 fold change
+    """
+    size = 4 ** k
+    freq_a = (counts_a + 1) / (counts_a.sum() + size)
+    freq_b = (counts_b + 1) / (counts_b.sum() + size)
+    fold = np.log2(freq_a / freq_b)
+    # Only k-mers seen on at least one side are candidates
+    seen = np.flatnonzero((counts_a + counts_b) > 0)
+
+    def ranked(order: np.ndarray) -> List[Dict]:
+        return [
+            {
+                "kmer": kmer_label(i, k),
+                "count_a": int(counts_a[i]),
+                "count_b": int(counts_b[i]),
+                "frequency_a": float(freq_a[i]),
+                "frequency_b": float(freq_b[i]),
+                "log2_fold_change": float(fold[i])
+            }
+            for i in order.tolist()
+        ]
+
+    def top_by(scores: np.ndarray) -> np.ndarray:
+        candidates = seen[scores[seen] > 0]
+        if len(candidates) > top:
+            candidates = candidates[np.argpartition(-scores[candidates], top - 1)[:top]]
+        return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+    return ranked(top_by(fold)), ranked(top_by(-fold))
@@ -0,0 +1,424 @@
+"""
+Standalone SQS consumers, so ingest scales separately from the API.
+
+Usage:
+    python -m app.worker [--processes N]
+
+A supervisor runs N consumer processes and one database writer process.
+Consumers analyze archives and send their write batches to the writer
+process, which commits them all through a single write connection, so the
+database sees two writers however many consumers run: this one and the
+API's own, for uploads and batch management.
+
+Every consumer reports a heartbeat after each poll and message; the
+supervisor restarts consumers that exit or stop sending heartbeats
+(WORKER_STALL_TIMEOUT_SECONDS), with exponential backoff for consumers that
+keep crashing, and logs a health report every WORKER_HEALTH_INTERVAL seconds
+(also written to WORKER_HEALTH_FILE when set). If the writer process exits it
+is restarted; consumers fail the archives whose batches were in flight, and
+those resume from their checkpoints when redelivered.
+
+The supervisor serves /metrics on WORKER_METRICS_PORT: the Prometheus
+metrics of every process it runs, summed, including the counts of processes
+it has since restarted. Each process publishes a snapshot every
+METRICS_PUBLISH_INTERVAL seconds, so the last seconds of a killed process's
+work can go uncounted.
+
+SIGTERM or SIGINT drains: consumers finish the archive in hand, whose message
+is only deleted once it is committed, and exit after their current long poll;
+the writer then commits what is left and exits. A second signal, or
+WORKER_DRAIN_TIMEOUT_SECONDS, terminates them. Run the API with
+SQS_CONSUMER_ENABLED=false when workers consume the queue. Workers refuse to
+start with AWS_BACKEND=local, whose stand-ins only exist inside the API process.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import pickle
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.utils.logger import logger
+from app.utils.metrics import WORKER_PROCESSES_ALIVE, WORKER_RESTARTS, registry
+
+# Seconds between supervisor checks
+CHECK_INTERVAL = 1.0
+# Longest wait before restarting a consumer that keeps crashing
+MAX_RESTART_BACKOFF = 60.0
+# A consumer that ran this long is considered healthy; its next crash restarts it at once
+HEALTHY_RUN_SECONDS = 60.0
+
+# Seconds between the metric snapshots each supervised process writes for the supervisor
+METRICS_PUBLISH_INTERVAL = 5.0
+
+OUTCOMES = ["processed", "failed", "skipped"]
+
+def _publish_metrics(path: str, done: threading.Event) -> None:
+    while True:
+        finished = done.wait(METRICS_PUBLISH_INTERVAL)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(registry.snapshot(), f)
+        os.replace(tmp, path)
+        if finished:
+            return
+
+@contextmanager
+def publishing_metrics(path: str):
+    """Write this process's metrics to path for the supervisor, periodically and once more on exit."""
+    done = threading.Event()
+    publisher = threading.Thread(target=_publish_metrics, args=(path, done), name="metrics-publisher", daemon=True)
+    publisher.start()
+    try:
+        yield
+    finally:
+        done.set()
+        publisher.join()
+
+def run_writer(address: str, metrics_path: str) -> None:
+    """
+    Body of the writer process: commit the consumers' write batches until
+    SIGTERM, which the supervisor sends once every consumer has exited.
+
+    Args:
+        address: Unix socket the consumers' RemoteWriters connect to
+        metrics_path: Where to publish this process's metrics
+    """
+    # The supervisor stops the writer last, after the consumers it serves
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    from app.db.writer import db_writer, serve_writes
+
+    # Left behind by a writer that was killed
+    if os.path.exists(address):
+        os.unlink(address)
+    with publishing_metrics(metrics_path):
+        db_writer.start()
+        try:
+            serve_writes(address, db_writer)
+        finally:
+            db_writer.stop()
+
+def run_consumer(stop, heartbeat, counters, writer_address: str, metrics_path: str) -> None:
+    """
+    Body of a consumer process: consume the queue until stop is set.
+
+    Args:
+        stop: multiprocessing.Event set by the supervisor to drain
+        heartbeat: multiprocessing.Value holding the time of the last poll or message
+        counters: multiprocessing.Array of message counts, in OUTCOMES order
+        writer_address: Unix socket of the writer process
+        metrics_path: Where to publish this process's metrics
+    """
+    # Ctrl-C reaches the whole process group; the supervisor decides how to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+
+    from app.db.writer import RemoteWriter
+    from app.services.sqs_service import sqs_service
+
+    def beat(status: str) -> None:
+        heartbeat.value = time.time()
+        if status in OUTCOMES:
+            with counters.get_lock():
+                counters[OUTCOMES.index(status)] += 1
+
+    heartbeat.value = time.time()
+    sqs_service.writer = RemoteWriter(writer_address)
+    with publishing_metrics(metrics_path):
+        sqs_service.process_messages(stop=stop, heartbeat=beat)
+
+class ProcessSlot:
+    """One supervised process, kept across its restarts."""
+
+    def __init__(self, name: str, role: str, context, run_dir: str):
+        self.name = name
+        self.role = role
+        self.context = context
+        self.metrics_path = os.path.join(run_dir, f"metrics-{name.replace(' ', '-')}.pickle")
+        # Counters and histograms of the slot's previous processes
+        self.retired_metrics: Dict[str, Dict] = {}
+        self.metrics_lock = threading.Lock()
+        self.process: Optional[multiprocessing.Process] = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.consecutive_failures = 0
+        self.restart_at: Optional[float] = None
+
+    def spawn(self, stop) -> multiprocessing.Process:
+        raise NotImplementedError
+
+    def start(self, stop) -> None:
+        self.retire_metrics()
+        self.process = self.spawn(stop)
+        self.started_at = time.time()
+        self.process.start()
+        self.restart_at = None
+        logger.info(f"Started {self.name} (pid {self.process.pid})")
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def kill(self) -> None:
+        if self.alive():
+            self.process.kill()
+            self.process.join()
+
+    def _load_metrics(self) -> Dict[str, Dict]:
+        try:
+            with open(self.metrics_path, "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def retire_metrics(self) -> None:
+        """Fold the last process's counts into the slot's, so totals do not go backwards across restarts."""
+        with self.metrics_lock:
+            self.retired_metrics = registry.combine([self.retired_metrics, self._load_metrics()], gauges=False)
+            if os.path.exists(self.metrics_path):
+                os.unlink(self.metrics_path)
+
+    def metrics(self) -> List[Dict[str, Dict]]:
+        """Snapshots to sum for the slot: its previous processes' and the current one's latest."""
+        with self.metrics_lock:
+            return [self.retired_metrics, self._load_metrics()]
+
+class WriterSlot(ProcessSlot):
+    """The database writer process, serving consumers on a Unix socket."""
+
+    def __init__(self, context, run_dir: str):
+        super().__init__("database writer", "writer", context, run_dir)
+        self.address = os.path.join(run_dir, "writer.sock")
+        self.stopping = False
+
+    def spawn(self, stop) -> multiprocessing.Process:
+        return self.context.Process(target=run_writer, args=(self.address, self.metrics_path), name="db-writer")
+
+    def health(self, now: float) -> Dict:
+        return {"pid": self.process.pid if self.process else None, "alive": self.alive(), "restarts": self.restarts}
+
+class ConsumerSlot(ProcessSlot):
+    """One supervised consumer."""
+
+    def __init__(self, index: int, context, run_dir: str, writer: WriterSlot):
+        super().__init__(f"consumer {index}", "consumer", context, run_dir)
+        self.index = index
+        self.writer = writer
+        self.heartbeat = context.Value("d", 0.0)
+        self.counters = context.Array("q", len(OUTCOMES))
+
+    def spawn(self, stop) -> multiprocessing.Process:
+        self.heartbeat.value = time.time()
+        return self.context.Process(
+            target=run_consumer,
+            args=(stop, self.heartbeat, self.counters, self.writer.address, self.metrics_path),
+            name=f"sqs-consumer-{self.index}"
+        )
+
+    def health(self, now: float) -> Dict:
+        return {
+            "consumer": self.index,
+            "pid": self.process.pid if self.process else None,
+            "alive": self.alive(),
+            "restarts": self.restarts,
+            "seconds_since_heartbeat": round(now - self.heartbeat.value, 1),
+            **{outcome: self.counters[i] for i, outcome in enumerate(OUTCOMES)},
+        }
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.supervisor.render_metrics().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        # Scrapes would flood the log
+        pass
+
+class MetricsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, supervisor: "Supervisor"):
+        super().__init__(address, MetricsHandler)
+        self.supervisor = supervisor
+
+class Supervisor:
+    def __init__(
+        self,
+        processes: int,
+        health_interval: float = settings.WORKER_HEALTH_INTERVAL,
+        health_file: str = settings.WORKER_HEALTH_FILE,
+        stall_timeout: float = settings.WORKER_STALL_TIMEOUT_SECONDS,
+        drain_timeout: float = settings.WORKER_DRAIN_TIMEOUT_SECONDS
+    ):
+        # Spawn: children must not inherit the supervisor's logging thread or database connections
+        self.context = multiprocessing.get_context("spawn")
+        self.stop = self.context.Event()
+        # Private to this user: the writer's socket and the processes' metric snapshots
+        self.run_dir = tempfile.mkdtemp(prefix="app-worker-")
+        self.writer = WriterSlot(self.context, self.run_dir)
+        self.slots = [ConsumerSlot(index, self.context, self.run_dir, self.writer) for index in range(processes)]
+        self.health_interval = health_interval
+        self.health_file = health_file
+        self.stall_timeout = stall_timeout
+        self.drain_timeout = drain_timeout
+        self.drain_started: Optional[float] = None
+        self.started_at = time.time()
+
+    def request_drain(self, signum=None, frame=None) -> None:
+        if self.drain_started is None:
+            logger.info("Draining consumers: finishing archives in progress")
+            self.drain_started = time.time()
+            self.stop.set()
+        else:
+            logger.warning("Second stop signal: terminating consumers")
+            self.terminate()
+
+    def terminate(self) -> None:
+        for slot in self.slots + [self.writer]:
+            if slot.alive():
+                slot.process.terminate()
+
+    def schedule_restart(self, slot: ProcessSlot, now: float) -> None:
+        """Start a process that never ran, or restart one that exited, backing off if it keeps crashing."""
+        if slot.restart_at is None:
+            if slot.process is not None:
+                ran = now - slot.started_at
+                slot.consecutive_failures = 0 if ran >= HEALTHY_RUN_SECONDS else slot.consecutive_failures + 1
+                backoff = min(MAX_RESTART_BACKOFF, 2 ** slot.consecutive_failures - 1)
+                logger.warning(
+                    f"{slot.name.capitalize()} exited with code {slot.process.exitcode} after {ran:.0f}s, "
+                    f"restarting in {backoff:.0f}s"
+                )
+                slot.restarts += 1
+                WORKER_RESTARTS.inc(slot.role)
+                slot.restart_at = now + backoff
+            else:
+                slot.restart_at = now
+        if now >= slot.restart_at:
+            slot.start(self.stop)
+
+    def check(self, now: float) -> None:
+        """Restart processes that exited or stalled."""
+        # Consumers whose batches were in flight fail those archives, which resume when redelivered
+        if not self.writer.alive() and self.drain_started is None:
+            self.schedule_restart(self.writer, now)
+        for slot in self.slots:
+            if slot.alive():
+                if self.stall_timeout and now - slot.heartbeat.value > self.stall_timeout:
+                    logger.error(f"Consumer {slot.index} sent no heartbeat for {now - slot.heartbeat.value:.0f}s, restarting it")
+                    slot.kill()
+                else:
+                    continue
+            if self.drain_started is None:
+                self.schedule_restart(slot, now)
+
+    def render_metrics(self) -> str:
+        """Prometheus metrics of the supervisor and every process it runs, summed."""
+        WORKER_PROCESSES_ALIVE.set(sum(slot.alive() for slot in self.slots), "consumer")
+        WORKER_PROCESSES_ALIVE.set(int(self.writer.alive()), "writer")
+        snapshots = [registry.snapshot()]
+        for slot in self.slots + [self.writer]:
+            snapshots.extend(slot.metrics())
+        return registry.render(registry.combine(snapshots))
+
+    def report(self, now: float) -> None:
+        health = {
+            "pid": os.getpid(),
+            "uptime_seconds": round(now - self.started_at),
+            "draining": self.drain_started is not None,
+            "writer": self.writer.health(now),
+            "consumers": [slot.health(now) for slot in self.slots],
+        }
+        alive = sum(consumer["alive"] for consumer in health["consumers"])
+        processed = sum(consumer["processed"] for consumer in health["consumers"])
+        failed = sum(consumer["failed"] for consumer in health["consumers"])
+        restarts = sum(consumer["restarts"] for consumer in health["consumers"])
+        logger.info(
+            f"Workers: {alive}/{len(self.slots)} alive, {processed} processed, {failed} failed, {restarts} restarts; "
+            f"writer {'alive' if health['writer']['alive'] else 'down'}, {health['writer']['restarts']} restarts"
+        )
+        if self.health_file:
+            path = Path(self.health_file)
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_text(json.dumps(health, indent=2))
+            os.replace(tmp, path)
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self.request_drain)
+        signal.signal(signal.SIGINT, self.request_drain)
+        server = None
+        if settings.METRICS_ENABLED and settings.WORKER_METRICS_PORT:
+            server = MetricsServer(("", settings.WORKER_METRICS_PORT), self)
+            threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+            logger.info(f"Serving worker metrics on port {settings.WORKER_METRICS_PORT}")
+        next_report = time.time()
+        while True:
+            now = time.time()
+            self.check(now)
+            if now >= next_report:
+                self.report(now)
+                next_report = now + self.health_interval
+            if self.drain_started is not None:
+                if not any(slot.alive() for slot in self.slots):
+                    if not self.writer.alive():
+                        break
+                    if not self.writer.stopping:
+                        # Every batch is queued by now; the writer commits them and exits
+                        self.writer.process.terminate()
+                        self.writer.stopping = True
+                if now - self.drain_started > self.drain_timeout:
+                    logger.warning(f"Consumers still busy after {self.drain_timeout}s, terminating them")
+                    self.terminate()
+            time.sleep(CHECK_INTERVAL)
+        for slot in self.slots + [self.writer]:
+            if slot.process is not None:
+                slot.process.join()
+        if server is not None:
+            server.shutdown()
+        shutil.rmtree(self.run_dir, ignore_errors=True)
+        self.report(time.time())
+        logger.info("All consumers stopped")
+        return 0
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.worker", description="Run supervised SQS consumer processes")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="consumer processes (default: CPU count)")
+    args = parser.parse_args(argv)
+    if args.processes < 1:
+        parser.error("--processes must be at least 1")
+    if settings.AWS_BACKEND == "local":
+        # The stand-ins live in one process's memory: spawned consumers would poll empty queues of their own
+        parser.error(
+            "AWS_BACKEND=local keeps S3 and SQS in the API process's memory, out of the workers' reach; "
+            "consume the queue in the API with SQS_CONSUMER_ENABLED=true instead"
+        )
+
+    from app.db.base_class import Base
+    from app.db.session import engine
+    # Register every table before create_all
+    from app.models import character as character_models, ingest as ingest_models, user as user_models  # noqa: F401
+
+    # Once here, rather than racing in every consumer
+    Base.metadata.create_all(bind=engine)
+    return Supervisor(args.processes).run()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Compare /character/{name} served through the response model and through
+the orjson row path, for a character with many patterns.
+
+Seeds a scratch database with one character and --patterns distinct
+motifs, then reports request latency and the peak memory traced while
+handling one request, for each path and for limit/min_count filtering.
+"""
+import os
+import sys
+import argparse
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+CHARACTER_NAME = "benchmark"
+
+def seed(db, patterns: int) -> None:
+    from app.utils.kmer import encode_kmer
+    from app.models.character import Character, CharacterPattern, PatternDictionary
+
+    if db.query(Character).filter(Character.character_name == CHARACTER_NAME).first():
+        return
+    rng = random.Random(0)
+    character = Character(
+        character_name=CHARACTER_NAME, affiliation="Benchmark", genetic_sequence="".join(rng.choice("ACGT") for _ in range(1000)),
+        power_level=50, gc_content=0.5, power_level_group="medium"
+    )
+    db.add(character)
+    db.flush()
+    motifs = set()
+    while len(motifs) < patterns:
+        motifs.add("".join(rng.choice("ACGT") for _ in range(rng.randint(8, 14))))
+    rows = [(motif, rng.randint(2, 50)) for motif in sorted(motifs)]
+    db.execute(PatternDictionary.__table__.insert(), [
+        {"id": i + 1, "pattern": motif, "length": len(motif), "code": encode_kmer(motif), "total_count": count}
+        for i, (motif, count) in enumerate(rows)
+    ])
+    db.execute(CharacterPattern.__table__.insert(), [
+        {"pattern_id": i + 1, "character_id": character.id, "count": count} for i, (motif, count) in enumerate(rows)
+    ])
+    db.commit()
+
+def measure(client, params: dict, requests: int) -> list:
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = client.get(f"/api/v1/character/{CHARACTER_NAME}", params=params)
+        latencies.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+    return latencies
+
+def peak_memory(client, params: dict) -> int:
+    tracemalloc.start()
+    try:
+        client.get(f"/api/v1/character/{CHARACTER_NAME}", params=params)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare /character/{name} latency and memory by serialization path")
+    parser.add_argument("--patterns", type=int, default=50000, help="patterns of the seeded character")
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--database", help="SQLite file to use (default: a new temporary one)")
+    args = parser.parse_args()
+
+    database = args.database or os.path.join(tempfile.mkdtemp(prefix="benchmark_character_"), "benchmark.db")
+    # Settings are read at import, so configure the app before importing it
+    os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite:///{database}"
+    for name, value in [
+        ("AWS_ACCESS_KEY_ID", "local"), ("AWS_SECRET_ACCESS_KEY", "local"), ("AWS_S3_BUCKET", "local-bucket"),
+        ("AWS_SQS_QUEUE_URL", "local-queue"), ("SECRET_KEY", "benchmark")
+    ]:
+        os.environ.setdefault(name, value)
+
+    from fastapi.testclient import TestClient
+    from app.core.config import settings
+    from app.core.security import get_current_user
+    from app.db.base_class import Base
+    from app.db.session import SessionLocal, engine
+    from app.main import app
+    from app.models import character as character_models, ingest as ingest_models, user as user_models  # noqa: F401
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        seed(db, args.patterns)
+    app.dependency_overrides[get_current_user] = lambda: "benchmark"
+    # Without the context manager the lifespan (and its SQS consumer) does not run
+    client = TestClient(app)
+
+    cases = [
+        ("response model", False, {}),
+        ("orjson", True, {}),
+        ("orjson limit=100", True, {"limit": 100}),
+        ("orjson min_count=40", True, {"min_count": 40}),
+    ]
+    def body(**params) -> dict:
+        return client.get(f"/api/v1/character/{CHARACTER_NAME}", params=params).json()
+
+    settings.CHARACTER_STATS_ORJSON = False
+    expected = body()
+    filtered = body(limit=100, min_count=40)
+    settings.CHARACTER_STATS_ORJSON = True
+    if body() != expected or body(limit=100, min_count=40) != filtered:
+        print("The orjson path returned a different body than the response model", file=sys.stderr)
+        return 1
+
+    print(f"{len(expected['patterns'])} patterns, {args.requests} requests per case")
+    for label, use_orjson, params in cases:
+        settings.CHARACTER_STATS_ORJSON = use_orjson
+        measure(client, params, 3)  # warm up
+        latencies = sorted(measure(client, params, args.requests))
+        p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)]
+        print(
+            f"{label:>20}: mean {statistics.mean(latencies):7.1f} ms  p50 {statistics.median(latencies):7.1f} ms  "
+            f"p99 {p99:7.1f} ms  peak memory {peak_memory(client, params) / 1e6:6.1f} MB"
+        )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+import sys
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.utils.logger import console_handler, file_handler, logger, queue_handler, record_logger, stop_logging
+
+def build_app(lines: int, errors: int) -> FastAPI:
+    """An endpoint that logs like an upload: a few info lines and some per-record errors."""
+    app = FastAPI()
+
+    @app.get("/work")
+    def work():
+        for i in range(lines):
+            logger.info(f"Processing step {i} of request")
+        for i in range(errors):
+            try:
+                raise ValueError(f"bad record {i}")
+            except ValueError as e:
+                record_logger.exception(f"Error creating character {i} with error: {e}")
+        return {"ok": True}
+
+    return app
+
+class SlowStream:
+    """Stands in for a slow console (a blocked pipe, a remote terminal)."""
+
+    def __init__(self, stream, delay: float):
+        self.stream = stream
+        self.delay = delay
+
+    def write(self, text: str) -> int:
+        time.sleep(self.delay)
+        return self.stream.write(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+def use_mode(mode: str) -> None:
+    """off: logging disabled; sync: handlers called inline (the old setup); async: queue + listener thread."""
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.disabled = mode == "off"
+    if mode == "sync":
+        logger.addHandler(console_handler)
+        logger.addHandler(file_handler)
+    else:
+        logger.addHandler(queue_handler)
+
+def measure(client: TestClient, requests: int) -> list:
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        client.get("/work")
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare request latency with logging off, synchronous and queued")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--lines", type=int, default=5, help="info lines logged per request")
+    parser.add_argument("--errors", type=int, default=2, help="per-record exceptions logged per request")
+    parser.add_argument("--console-delay-ms", type=float, default=0, help="simulated cost of each console write")
+    args = parser.parse_args()
+
+    client = TestClient(build_app(args.lines, args.errors))
+    results = {}
+    # Console output would drown the report; the file handler still does real I/O
+    sys.stdout, stdout = open("/dev/null", "w"), sys.stdout
+    console_handler.setStream(SlowStream(sys.stdout, args.console_delay_ms / 1000))
+    # Keep benchmark lines out of logs/app.log
+    log_dir = tempfile.TemporaryDirectory()
+    file_handler.close()
+    file_handler.baseFilename = str(Path(log_dir.name) / "app.log")
+    try:
+        for mode in ("off", "sync", "async"):
+            use_mode(mode)
+            measure(client, 20)  # warm up
+            results[mode] = measure(client, args.requests)
+        stop_logging()
+    finally:
+        sys.stdout = stdout
+        log_dir.cleanup()
+
+    for mode, latencies in results.items():
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        print(f"{mode:>5}: mean {statistics.mean(latencies):.3f} ms  p50 {statistics.median(latencies):.3f} ms  p99 {p99:.3f} ms")
@@ -0,0 +1,69 @@
+import sys
+import argparse
+import os
+import re
+import statistics
+import subprocess
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+
+ROOT = Path(__file__).parent.parent
+
+# Only needed by some requests or by the SQS consumer; importing them at startup is a regression
+DEFERRED_MODULES = ["matplotlib", "seaborn", "pandas", "boto3"]
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+def measure_import(module: str) -> list:
+    """
+    Import a module in a fresh interpreter with -X importtime.
+
+    Returns:
+        list: (module name, self µs, cumulative µs, nesting depth) in import order
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env={**os.environ, "PYTHONPATH": str(ROOT)},
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return imports
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check how long importing the app takes against STARTUP_IMPORT_BUDGET_MS")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to time; the median is checked")
+    parser.add_argument("--budget-ms", type=float, default=settings.STARTUP_IMPORT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    args = parser.parse_args()
+
+    totals = []
+    for _ in range(args.runs):
+        imports = measure_import(args.module)
+        totals.append(next(cumulative for name, _, cumulative, _ in imports if name == args.module) / 1000)
+    median_ms = statistics.median(totals)
+
+    print(f"import {args.module}: median {median_ms:.0f} ms over {args.runs} runs "
+          f"(min {min(totals):.0f} ms, max {max(totals):.0f} ms), budget {args.budget_ms:.0f} ms")
+    print("Slowest imports (cumulative, last run):")
+    for name, _, cumulative, depth in sorted(imports, key=lambda i: i[2], reverse=True)[1:args.top + 1]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    failures = []
+    deferred = sorted({name.split(".")[0] for name, *_ in imports} & set(DEFERRED_MODULES))
+    if deferred:
+        failures.append(f"modules that should be imported lazily were imported at startup: {', '.join(deferred)}")
+    if median_ms > args.budget_ms:
+        failures.append(f"startup took {median_ms:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,47 @@
+import sys
+import argparse
+from functools import partial
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.crud import spectrum as crud_spectrum
+from app.db.base_class import Base
+from app.db.session import ReadSessionLocal, engine
+from app.db.writer import db_writer
+from app.utils.spectrum import check_k, encode_spectrum, kmer_spectrum
+
+def store(db, k, rows, spectra) -> None:
+    # Characters with a spectrum for another k have it replaced
+    crud_spectrum.remove_spectra(db, [row.id for row in rows])
+    crud_spectrum.add_spectra(db, k, spectra)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compute the k-mer spectra of characters ingested before spectra were stored, or after k changed"
+    )
+    parser.add_argument("--k", type=int, default=settings.KMER_SPECTRUM_K, help="k-mer length (default: KMER_SPECTRUM_K)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="characters per transaction")
+    args = parser.parse_args()
+    check_k(args.k)
+
+    Base.metadata.create_all(bind=engine)
+    done = 0
+    last_id = 0
+    try:
+        while True:
+            with ReadSessionLocal() as db:
+                rows = crud_spectrum.get_characters_without_spectrum(db, args.k, last_id, args.chunk_size)
+            if not rows:
+                break
+            spectra = [
+                (row.id, row.affiliation, encode_spectrum(kmer_spectrum(row.genetic_sequence or "", args.k)))
+                for row in rows
+            ]
+            db_writer.write(partial(store, k=args.k, rows=rows, spectra=spectra))
+            done += len(rows)
+            last_id = rows[-1].id
+            print(f"\r{done} spectra computed", end="", flush=True)
+        print(f"\r{done} spectra computed (k={args.k})")
+    finally:
+        db_writer.stop()
@@ -2,37 +2,14 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from sqlalchemy.orm import Session
-from app.db.session import SessionLocal
-from app.models.character import Character, Pattern
-
-def delete_patterns(db: Session) -> None:
-    patterns = db.query(Pattern).all()
-    for pattern in patterns:
-        db.delete(pattern)
-    db.commit()
-
-    print("Patterns deleted successfully!")
-
-def delete_characters(db: Session) -> None:
-    characters = db.query(Character).all()
-    for character in characters:
-        db.delete(character)
-    db.commit()
-
-    print("Characters deleted successfully!")
+from app.db.writer import db_writer
+from app.crud.ingest import purge_all
+from app.services.processing import refresh_snapshot
 
 if __name__ == "__main__":
-    db = SessionLocal()
     try:
-        delete_patterns(db)
-        delete_characters(db)
-        characters = db.query(Character).all()
-        for character in characters:
-            print(character.name)
-            print(character.affiliation)
-            print(character.power_level)
-            print(character.genetic_sequence)
-            print("--------------------------------")
+        db_writer.write(purge_all)
+        refresh_snapshot()
+        print("Characters, patterns and ingest batches deleted successfully!")
     finally:
-        db.close() 
\ No newline at end of file
+        db_writer.stop()
@@ -0,0 +1,19 @@
+import sys
+import time
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.services.snapshot import SnapshotService
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export characters and patterns to the columnar snapshot")
+    parser.add_argument("--dir", default=settings.SNAPSHOT_DIR, help="snapshot directory (default: SNAPSHOT_DIR)")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild from scratch instead of appending new rows")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    manifest = SnapshotService(args.dir).refresh(rebuild=args.rebuild)
+    rows = ", ".join(f"{count} {table}" for table, count in manifest["rows"].items())
+    print(f"Snapshot in {args.dir} holds {rows} ({time.perf_counter() - start:.2f}s)")
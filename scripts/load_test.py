@@ -0,0 +1,190 @@
+"""
+End-to-end load test against the in-process S3/SQS stand-ins.
+
+Starts the app under uvicorn with AWS_BACKEND=local on a scratch database,
+then pushes archives through the production path (generate-upload-url,
+presigned PUT, S3 event on the queue, SQS consumer, process_zip_file) at a
+target rate while polling the stats endpoints, and reports ingest lag,
+end-to-end latency, messages/s and API latency under load.
+"""
+import os
+import sys
+import argparse
+import io
+import json
+import random
+import socket
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+import zipfile
+from pathlib import Path
+from typing import Dict, List, Optional
+sys.path.append(str(Path(__file__).parent.parent))
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] if ordered else float("nan")
+
+def make_archive(seed: int, characters: int, sequence_length: int, members: int = 4) -> bytes:
+    rng = random.Random(seed)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for member in range(members):
+            records = [
+                {
+                    "character_name": f"load{seed}_{member}_{i}",
+                    "affiliation": rng.choice(["Avengers", "X-Men", "Villains", "Guardians"]),
+                    "genetic_sequence": "".join(rng.choice("ACGT") for _ in range(sequence_length)),
+                    "power_level": rng.randint(0, 100)
+                }
+                for i in range(characters // members)
+            ]
+            archive.writestr(f"data_{member}.json", json.dumps(records))
+    return buffer.getvalue()
+
+class Api:
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.token = None
+
+    def request(self, method: str, path_or_url: str, data: Optional[bytes] = None, headers: Optional[Dict] = None):
+        url = path_or_url if path_or_url.startswith("http") else self.base_url + path_or_url
+        headers = dict(headers or {})
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        request = urllib.request.Request(url, data=data, headers=headers, method=method)
+        with urllib.request.urlopen(request, timeout=120) as response:
+            body = response.read()
+        return json.loads(body) if body else None
+
+    def login(self, email: str, password: str) -> None:
+        form = urllib.parse.urlencode({"username": email, "password": password}).encode()
+        self.token = self.request("POST", "/api/v1/login", form, {"Content-Type": "application/x-www-form-urlencoded"})["access_token"]
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Push archives through the upload -> SQS -> ingest path and measure it")
+    parser.add_argument("--archives", type=int, default=50, help="archives to upload")
+    parser.add_argument("--rate", type=float, default=2.0, help="target uploads per second")
+    parser.add_argument("--characters", type=int, default=200, help="characters per archive")
+    parser.add_argument("--sequence-length", type=int, default=200)
+    parser.add_argument(
+        "--endpoints", default="/api/v1/stats,/api/v1/affiliations/stats",
+        help="comma-separated endpoints polled during the run"
+    )
+    parser.add_argument("--poll-interval", type=float, default=0.5, help="seconds between polls of each endpoint")
+    parser.add_argument("--database", help="SQLite file to use (default: a new temporary one)")
+    parser.add_argument("--timeout", type=float, default=600, help="give up waiting for ingest after this many seconds")
+    args = parser.parse_args()
+
+    port = free_port()
+    database = args.database or os.path.join(tempfile.mkdtemp(prefix="load_test_"), "load_test.db")
+    # Settings are read at import, so configure the app before importing it
+    os.environ.update({
+        "AWS_BACKEND": "local",
+        "LOCAL_S3_ENDPOINT": f"http://127.0.0.1:{port}/local-s3",
+        "SQLALCHEMY_DATABASE_URL": f"sqlite:///{database}",
+    })
+    for name, value in [
+        ("AWS_ACCESS_KEY_ID", "local"), ("AWS_SECRET_ACCESS_KEY", "local"), ("AWS_S3_BUCKET", "local-bucket"),
+        ("AWS_SQS_QUEUE_URL", "local-queue"), ("SECRET_KEY", "load-test"), ("SQS_QUEUE_DEPTH_INTERVAL", "1")
+    ]:
+        os.environ.setdefault(name, value)
+
+    import uvicorn
+    from app.core.security import get_password_hash
+    from app.db.base_class import Base
+    from app.db.session import SessionLocal, engine
+    from app.main import app
+    from app.models.user import User
+
+    Base.metadata.create_all(bind=engine)
+    email, password = "loadtest@example.com", "loadtest"
+    with SessionLocal() as db:
+        if not db.query(User).filter(User.email == email).first():
+            db.add(User(email=email, username="loadtest", hashed_password=get_password_hash(password), is_superuser=True, is_active=True))
+            db.commit()
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    server_thread = threading.Thread(target=server.run, daemon=True)
+    server_thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    api = Api(f"http://127.0.0.1:{port}")
+    api.login(email, password)
+    archives = [make_archive(seed, args.characters, args.sequence_length) for seed in range(args.archives)]
+    print(f"Uploading {args.archives} archives ({sum(map(len, archives)) / 1e6:.1f} MB) at {args.rate}/s to {database}")
+
+    uploaded_at: Dict[str, float] = {}
+    started_at: Dict[str, float] = {}
+    completed_at: Dict[str, float] = {}
+    api_latencies: Dict[str, List[float]] = {endpoint: [] for endpoint in args.endpoints.split(",") if endpoint}
+    api_errors: Dict[str, int] = {endpoint: 0 for endpoint in api_latencies}
+    done = threading.Event()
+
+    def upload() -> None:
+        start = time.perf_counter()
+        for i, archive in enumerate(archives):
+            time.sleep(max(0.0, start + i / args.rate - time.perf_counter()))
+            begin = time.perf_counter()
+            target = api.request("POST", "/api/v1/generate-upload-url")
+            api.request("PUT", target["upload_url"], archive, {"Content-Type": "application/zip"})
+            started_at[target["object_key"]] = begin
+            uploaded_at[target["object_key"]] = time.perf_counter()
+
+    def watch_batches() -> None:
+        while not done.is_set():
+            for batch in api.request("GET", "/api/v1/batches"):
+                if batch["completed"] and batch["source"] not in completed_at:
+                    completed_at[batch["source"]] = time.perf_counter()
+            if len(completed_at) >= args.archives:
+                done.set()
+            time.sleep(0.1)
+
+    def poll(endpoint: str) -> None:
+        while not done.is_set():
+            begin = time.perf_counter()
+            try:
+                api.request("GET", endpoint)
+                api_latencies[endpoint].append(time.perf_counter() - begin)
+            except Exception:
+                api_errors[endpoint] += 1
+            done.wait(args.poll_interval)
+
+    run_start = time.perf_counter()
+    threads = [threading.Thread(target=upload, daemon=True), threading.Thread(target=watch_batches, daemon=True)]
+    threads += [threading.Thread(target=poll, args=(endpoint,), daemon=True) for endpoint in api_latencies]
+    for thread in threads:
+        thread.start()
+    threads[0].join()
+    upload_end = time.perf_counter()
+    if not done.wait(args.timeout):
+        print(f"Timed out: {len(completed_at)} of {args.archives} archives ingested")
+    done.set()
+    server.should_exit = True
+    server_thread.join()
+
+    latencies = [completed_at[key] - started_at[key] for key in completed_at if key in started_at]
+    ingest_end = max(completed_at.values(), default=upload_end)
+    ingest_seconds = ingest_end - run_start
+    print(f"Uploads:     {len(uploaded_at)} in {upload_end - run_start:.1f}s ({len(uploaded_at) / (upload_end - run_start):.2f}/s)")
+    print(f"Ingest:      {len(completed_at)} archives in {ingest_seconds:.1f}s ({len(completed_at) / ingest_seconds:.2f} messages/s, "
+          f"{len(completed_at) * args.characters / ingest_seconds:.0f} characters/s)")
+    print(f"Ingest lag:  {max(0.0, ingest_end - upload_end):.1f}s after the last upload")
+    print(f"End to end:  p50 {percentile(latencies, 50):.2f}s  p90 {percentile(latencies, 90):.2f}s  "
+          f"p99 {percentile(latencies, 99):.2f}s  max {max(latencies, default=float('nan')):.2f}s")
+    for endpoint, values in api_latencies.items():
+        print(f"{endpoint}: {len(values)} requests, {api_errors[endpoint]} errors, p50 {percentile(values, 50) * 1000:.0f} ms  "
+              f"p99 {percentile(values, 99) * 1000:.0f} ms  max {max(values, default=float('nan')) * 1000:.0f} ms")
+    return 0 if len(completed_at) >= args.archives else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+import sys
+import argparse
+from functools import partial
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.db.session import SessionLocal
+from app.db.writer import db_writer
+from app.crud import ingest as crud_ingest
+from app.services.processing import refresh_snapshot, replace_batch as replace_archive
+
+def list_batches() -> None:
+    db = SessionLocal()
+    try:
+        for batch in crud_ingest.get_batches(db):
+            status = "completed" if batch.completed else f"in progress (member {batch.member_index}, record {batch.record_offset})"
+            print(f"{batch.id}\t{batch.source}\t{batch.character_count} characters\t{batch.pattern_count} patterns\t{status}")
+    finally:
+        db.close()
+
+def purge_batch(batch_id: int, rebuild: bool) -> bool:
+    batch = db_writer.write(partial(crud_ingest.purge_batch, batch_id=batch_id, rebuild=rebuild))
+    if not batch:
+        print(f"Batch {batch_id} not found")
+        return False
+    print(f"Batch {batch_id} purged ({batch.character_count} characters, {batch.pattern_count} patterns)")
+    refresh_snapshot()
+    return True
+
+def replace_batch(batch_id: int, archive: Path, rebuild: bool) -> bool:
+    try:
+        new_batch_id = replace_archive(batch_id, archive.read_bytes(), source=archive.name, rebuild=rebuild)
+    except Exception as e:
+        print(f"Batch {batch_id} was not replaced: {e}")
+        return False
+    if new_batch_id is None:
+        print(f"Batch {batch_id} not found")
+        return False
+    print(f"Batch {batch_id} replaced by batch {new_batch_id}")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List, purge or replace ingest batches")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list")
+    purge_parser = subparsers.add_parser("purge")
+    purge_parser.add_argument("batch_id", type=int)
+    purge_parser.add_argument("--rebuild", action="store_true", help="rebuild tables from the surviving rows")
+    replace_parser = subparsers.add_parser("replace")
+    replace_parser.add_argument("batch_id", type=int)
+    replace_parser.add_argument("archive", type=Path)
+    replace_parser.add_argument("--rebuild", action="store_true", help="rebuild tables from the surviving rows")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "list":
+            list_batches()
+        elif args.command == "purge":
+            purge_batch(args.batch_id, args.rebuild)
+        elif args.command == "replace":
+            replace_batch(args.batch_id, args.archive, args.rebuild)
+    finally:
+        db_writer.stop()
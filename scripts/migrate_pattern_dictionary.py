@@ -0,0 +1,137 @@
+import sys
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.db.base_class import Base
+from app.db.session import engine
+from app.core.config import settings
+# Register every table before create_all
+from app.models import character as character_models, ingest as ingest_models  # noqa: F401
+from app.services.processing import sequence_hash
+from app.utils.kmer import encode_kmer
+
+LEGACY_TOP_PATTERNS_SQL = """
+    SELECT pattern, SUM(count) AS total_count FROM patterns
+    GROUP BY pattern ORDER BY total_count DESC LIMIT :limit
+"""
+
+TOP_PATTERNS_SQL = """
+    SELECT pattern, total_count FROM pattern_dictionary
+    WHERE total_count > 0 ORDER BY total_count DESC LIMIT :limit
+"""
+
+def database_size(cursor) -> int:
+    page_count = cursor.execute("PRAGMA page_count").fetchone()[0]
+    page_size = cursor.execute("PRAGMA page_size").fetchone()[0]
+    return page_count * page_size
+
+def time_query(cursor, sql: str, repeat: int = 3) -> float:
+    """Return the best wall-clock time of a query in milliseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cursor.execute(sql, {"limit": settings.TOP_PATTERNS_COUNT}).fetchall()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+# Columns added after the tables were first created: (table, column, definition, indexed)
+ADDED_COLUMNS = [
+    ("pattern_dictionary", "total_count", "INTEGER NOT NULL DEFAULT 0", True),
+    ("characters", "batch_id", "INTEGER REFERENCES ingest_batches (id)", True),
+    ("character_patterns", "batch_id", "INTEGER REFERENCES ingest_batches (id)", True),
+    ("characters", "sequence_hash", "VARCHAR(64)", False),
+]
+
+# Indexes added after the tables were first created: (name, table, columns)
+ADDED_INDEXES = [
+    ("ix_characters_name_affiliation", "characters", "character_name, affiliation"),
+]
+
+def add_missing_columns(cursor) -> bool:
+    """Add columns and indexes that create_all does not add to existing tables. Returns True if any columns were added."""
+    added = False
+    for table, column, definition, indexed in ADDED_COLUMNS:
+        columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})").fetchall()]
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            if indexed:
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_{column} ON {table} ({column})")
+            added = True
+    for name, table, columns in ADDED_INDEXES:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+    return added
+
+def backfill_sequence_hashes(connection) -> None:
+    connection.create_function("sequence_hash", 1, sequence_hash, deterministic=True)
+    connection.execute(
+        "UPDATE characters SET sequence_hash = sequence_hash(genetic_sequence) "
+        "WHERE sequence_hash IS NULL AND genetic_sequence IS NOT NULL"
+    )
+
+def backfill_pattern_totals(cursor) -> None:
+    cursor.execute("""
+        UPDATE pattern_dictionary SET total_count = COALESCE(
+            (SELECT SUM(count) FROM character_patterns WHERE pattern_id = pattern_dictionary.id), 0
+        )
+    """)
+
+def has_legacy_patterns_table(cursor) -> bool:
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(patterns)").fetchall()]
+    return 'pattern' in columns and 'character_id' in columns
+
+def migrate(connection) -> None:
+    """Move rows of the legacy patterns table into the dictionary and link tables."""
+    connection.create_function("encode_kmer", 1, encode_kmer, deterministic=True)
+    cursor = connection.cursor()
+    cursor.execute("BEGIN")
+    cursor.execute("""
+        INSERT INTO pattern_dictionary (pattern, length, code, total_count)
+        SELECT DISTINCT pattern, length(pattern), encode_kmer(pattern), 0 FROM patterns
+        WHERE pattern IS NOT NULL AND pattern NOT IN (SELECT pattern FROM pattern_dictionary)
+    """)
+    cursor.execute("""
+        INSERT INTO character_patterns (pattern_id, character_id, count)
+        SELECT d.id, p.character_id, SUM(p.count) FROM patterns p
+        JOIN pattern_dictionary d ON d.pattern = p.pattern
+        WHERE p.character_id IS NOT NULL
+        GROUP BY d.id, p.character_id
+    """)
+    cursor.execute("DROP TABLE patterns")
+    backfill_pattern_totals(cursor)
+    cursor.execute("COMMIT")
+    cursor.execute("VACUUM")
+
+if __name__ == "__main__":
+    Base.metadata.create_all(bind=engine)
+
+    raw_connection = engine.raw_connection()
+    try:
+        connection = raw_connection.driver_connection
+        connection.isolation_level = None
+        cursor = connection.cursor()
+
+        if add_missing_columns(cursor):
+            backfill_pattern_totals(cursor)
+            backfill_sequence_hashes(connection)
+            print("Added batch, pattern total and sequence hash columns to existing tables.")
+
+        if not has_legacy_patterns_table(cursor):
+            print("No legacy patterns table found, nothing to migrate.")
+            sys.exit(0)
+
+        size_before = database_size(cursor)
+        query_before = time_query(cursor, LEGACY_TOP_PATTERNS_SQL)
+
+        migrate(connection)
+
+        size_after = database_size(cursor)
+        query_after = time_query(cursor, TOP_PATTERNS_SQL)
+        patterns = cursor.execute("SELECT COUNT(*) FROM pattern_dictionary").fetchone()[0]
+        links = cursor.execute("SELECT COUNT(*) FROM character_patterns").fetchone()[0]
+    finally:
+        raw_connection.close()
+
+    print(f"Migrated {links} character patterns onto {patterns} distinct motifs")
+    print(f"Database size:     {size_before / 1e6:.2f} MB -> {size_after / 1e6:.2f} MB")
+    print(f"Top patterns query: {query_before:.1f} ms -> {query_after:.1f} ms")